@@ -1,30 +1,338 @@
-from flask import Flask, request, jsonify
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from elasticsearch import Elasticsearch
 from services.brain import QueryBrain
-from services.search_engine import SearchEngine
-import json 
+from services.embeddings import get_encoder
+from services.es_client import CircuitOpenError, create_client
+from services.export import EXPORT_FORMATS, csv_lines, ndjson_lines, parse_export_fields
+from services.metrics import REGISTRY, REQUEST_SECONDS, stage, start_timings
+from services.prefix_trie import PrefixTrie, TrieSnapshot
+from services.result_cache import ResultCache, shared_tier_from_url
+from services.structured_log import configure_logging
+from services.search_engine import SUGGEST_KINDS, SearchEngine, UnsupportedSearchError, parse_paging, parse_facets, parse_mode, format_facets, next_cursor
+import json
+import os
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", "300"))
+# SQLite file path or redis:// URL for a cache shared between workers.
+RESULT_CACHE_SHARED = os.environ.get("RESULT_CACHE_SHARED")
+
+SUGGEST_TRIE = os.environ.get("SUGGEST_TRIE", "1") == "1"
+SUGGEST_TRIE_TERMS = int(os.environ.get("SUGGEST_TRIE_TERMS", "2000"))
+MAX_SUGGEST_SIZE = 20
+
+MAX_BATCH_QUERIES = 500
+BATCH_EXTRACT_WORKERS = 16
+# Queries per _msearch request; smaller chunks stream their first results sooner.
+MSEARCH_CHUNK = 25
+MSEARCH_WORKERS = 4
+
+# Text file with one query per line, replayed through extraction and search during warm-up.
+WARMUP_QUERIES = os.environ.get("WARMUP_QUERIES")
+WARMUP_ENTITY_CACHE = int(os.environ.get("WARMUP_ENTITY_CACHE", "1000"))
+
+configure_logging()
+logger = logging.getLogger("api")
 
 app = Flask(__name__)
 CORS(app)
-es = Elasticsearch("http://localhost:9200")
+es = create_client()
 brain = QueryBrain()
-engine = SearchEngine(es)
+shared_tier = shared_tier_from_url(RESULT_CACHE_SHARED, RESULT_CACHE_TTL) if RESULT_CACHE_SHARED else None
+engine = SearchEngine(es, cache=ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, shared_tier), encoder=get_encoder())
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_EXTRACT_WORKERS)
+msearch_pool = ThreadPoolExecutor(max_workers=MSEARCH_WORKERS)
+suggest_trie = TrieSnapshot()
+ready = threading.Event()
+draining = threading.Event()
+
+def load_suggest_trie():
+    try:
+        suggest_trie.replace(PrefixTrie.build(engine.suggest_snapshot(SUGGEST_TRIE_TERMS), top_k=MAX_SUGGEST_SIZE))
+    except Exception as e:
+        logger.warning(f"Suggest trie not loaded, serving /suggest from ES: {e}")
+
+if SUGGEST_TRIE:
+    # A new generation can bring new terms; rebuild off the request thread that noticed it.
+    engine.generation_listeners.append(
+        lambda generation: threading.Thread(target=load_suggest_trie, daemon=True).start())
+
+def ping_es():
+    try:
+        return es.ping()
+    except CircuitOpenError:
+        return False
+
+def replay_warmup_queries(path):
+    with open(path) as f:
+        queries = [line.strip() for line in f if line.strip()]
+    for query in queries:
+        try:
+            engine.execute(brain.extract_entities(query))
+        except Exception as e:
+            logger.warning(f"Warm-up query {query!r} failed: {e}")
+    return len(queries)
+
+def warm_up():
+    """
+    Gets this process ready before it takes traffic: opens ES connections, resolves the
+    index generation, loads the suggest trie, primes the entity and result caches and runs
+    one embedding. /readyz answers 503 until it has finished.
+    """
+    started = time.perf_counter()
+    report = {"es": ping_es()}
+    if report["es"]:
+        report["generation"] = engine.current_generation()
+    if SUGGEST_TRIE:
+        load_suggest_trie()
+    report["entity_cache"] = brain.cache.warm(WARMUP_ENTITY_CACHE)
+    if WARMUP_QUERIES:
+        try:
+            report["queries"] = replay_warmup_queries(WARMUP_QUERIES)
+        except OSError as e:
+            logger.warning(f"Warm-up queries not replayed: {e}")
+    if engine.encoder is not None:
+        engine.encoder.encode(["warm-up"])
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info("warm-up", extra={"fields": report})
+    ready.set()
+
+def begin_drain():
+    """Stops reporting ready; /readyz answers "draining" from here on."""
+    draining.set()
+    ready.clear()
+
+def shutdown():
+    """Stops reporting ready, then lets queued LLM and batch work finish before closing ES."""
+    begin_drain()
+    brain.close()
+    batch_pool.shutdown(wait=True)
+    msearch_pool.shutdown(wait=True)
+    es.close()
+
+def search_payload(entities, results, paging):
+    payload = {
+        "interpretation": entities,
+        "trials": [hit['_source'] for hit in results['hits']['hits']],
+        "total": results['hits']['total']['value'],
+        "page": paging["page"],
+        "page_size": paging["page_size"],
+        "next_cursor": next_cursor(results, paging["page_size"])
+    }
+    if 'aggregations' in results:
+        payload["facets"] = format_facets(results)
+    return payload
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or "unknown",
+                                status=response.status_code)
+    return response
+
+@app.errorhandler(CircuitOpenError)
+def es_unavailable(e):
+    return jsonify({"error": str(e)}), 503
 
 @app.route('/search', methods=['GET'])
 def search():
     user_query = request.args.get('q', '')
-    print(user_query)
-    
+    try:
+        paging = parse_paging(request.args)
+        facets = parse_facets(request.args.get('facets'))
+        mode = parse_mode(request.args.get('mode'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    timings = start_timings()
+    with stage("extract"):
+        entities = brain.extract_entities(user_query)
+    try:
+        results = engine.execute(entities, facets=facets, mode=mode, **paging)
+    except UnsupportedSearchError as e:
+        return jsonify({"error": str(e)}), 400
+    with stage("serialize"):
+        payload = search_payload(entities, results, paging)
+        if mode != "keyword":
+            # Non-keyword modes reject cursors, including when they fell back to a keyword search.
+            payload["next_cursor"] = None
+        response = jsonify(payload)
+
+    logger.info("search", extra={"fields": {
+        "query": user_query,
+        "entities": entities,
+        "mode": mode,
+        "page": paging["page"],
+        "total": results['hits']['total']['value'],
+        "timings_ms": timings,
+        "elapsed_ms": round((time.perf_counter() - g.request_started) * 1000, 2),
+    }})
+    return response
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    payload = request.get_json(silent=True) or {}
+    queries = payload.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "Body must be {\"queries\": [...]}"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+    try:
+        paging = parse_paging({k: v for k, v in payload.items() if k != 'queries'})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    paging["cursor"] = None
+
+    # Repeated query strings share one extraction, identical entity dicts one ES search.
+    unique_queries = list(dict.fromkeys(str(q).strip() for q in queries))
+    positions = {}
+    for position, query in enumerate(queries):
+        positions.setdefault(str(query).strip(), []).append((position, query))
+
+    def run_chunk(chunk_keys):
+        return engine.msearch([by_key[k] for k in chunk_keys], **paging)
+
+    def lines(key, entries, response):
+        for position, query in entries:
+            line = {"position": position, "query": query}
+            if 'error' in response:
+                line["interpretation"] = by_key[key]
+                line["error"] = response['error']
+            else:
+                line.update(search_payload(by_key[key], response, paging))
+            yield json.dumps(line) + "\n"
+
+    by_key, waiting, answered = {}, {}, {}
+
+    def stream():
+        extractions, searches, new_keys = {}, {}, []
+
+        def resolved(query, entities):
+            key = json.dumps(entities, sort_keys=True)
+            if key in answered:
+                return list(lines(key, positions[query], answered[key]))
+            if key not in by_key:
+                by_key[key] = entities
+                new_keys.append(key)
+            waiting.setdefault(key, []).extend(positions[query])
+            return []
+
+        def dispatch():
+            for i in range(0, len(new_keys), MSEARCH_CHUNK):
+                chunk_keys = new_keys[i:i + MSEARCH_CHUNK]
+                searches[msearch_pool.submit(run_chunk, chunk_keys)] = chunk_keys
+            new_keys.clear()
+
+        # Rule and cache hits resolve right here; only LLM-bound queries take a batch_pool
+        # thread, and searches run on their own pool so they never queue behind them.
+        for query in unique_queries:
+            entities, rule_entities = brain.local_entities(query)
+            if entities is None:
+                extractions[batch_pool.submit(brain.extract_with_llm, query, rule_entities)] = query
+            else:
+                resolved(query, entities)
+        dispatch()
+        while extractions or searches:
+            done, _ = wait([*extractions, *searches], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in extractions:
+                    yield from resolved(extractions.pop(future), future.result())
+                else:
+                    chunk_keys = searches.pop(future)
+                    try:
+                        responses = future.result()
+                    except Exception as e:
+                        responses = [{"error": str(e)}] * len(chunk_keys)
+                    for key, response in zip(chunk_keys, responses):
+                        answered[key] = response
+                        yield from lines(key, waiting.pop(key), response)
+            dispatch()
+
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/export', methods=['GET'])
+def export():
+    user_query = request.args.get('q', '')
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format: {export_format}"}), 400
+    try:
+        fields = parse_export_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     entities = brain.extract_entities(user_query)
-    print(f"Entities: {entities}")
-    results = engine.execute(entities)
-    
+    sources = engine.export(entities, fields)
+    lines = csv_lines(sources, fields) if export_format == 'csv' else ndjson_lines(sources)
+    logger.info("export", extra={"fields": {"query": user_query, "entities": entities, "format": export_format}})
+    return Response(
+        stream_with_context(lines),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename=trials.{export_format}"},
+    )
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    prefix = request.args.get('q', '').strip()
+    if not prefix:
+        return jsonify({"suggestions": []})
+    kinds = [k for k in request.args.get('kinds', '').split(',') if k] or list(SUGGEST_KINDS)
+    unknown = [k for k in kinds if k not in SUGGEST_KINDS]
+    if unknown:
+        return jsonify({"error": f"Unknown kinds: {', '.join(unknown)}"}), 400
+    try:
+        size = max(1, min(int(request.args.get('size', 10)), MAX_SUGGEST_SIZE))
+    except ValueError:
+        return jsonify({"error": "size must be an integer"}), 400
+
+    # Keeps the trie in step with alias swaps even when no /search runs.
+    engine.current_generation()
+    suggestions = suggest_trie.lookup(prefix, kinds, size)
+    if suggestions is not None:
+        return jsonify({"suggestions": suggestions, "source": "trie"})
+    return jsonify({"suggestions": engine.suggest(prefix, kinds, size), "source": "es"})
+
+@app.route('/stats', methods=['GET'])
+def stats():
     return jsonify({
-        "interpretation": entities,
-        "trials": [hit['_source'] for hit in results['hits']['hits']],
-        "total": results['hits']['total']['value']
+        "entity_cache": brain.cache.stats(),
+        "result_cache": engine.cache.stats(),
+        "llm_batching": brain.coalescer.stats() if brain.coalescer else None
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    if not ready.is_set():
+        return jsonify({"ready": False, "reason": "draining" if draining.is_set() else "warming up"}), 503
+    if not ping_es():
+        return jsonify({"ready": False, "reason": "elasticsearch unreachable"}), 503
+    return jsonify({"ready": True, "generation": engine.current_generation()})
+
+@app.route('/trial/<nct_id>', methods=['GET'])
+def trial(nct_id):
+    source = engine.get_trial(nct_id)
+    if source is None:
+        return jsonify({"error": f"Trial {nct_id} not found"}), 404
+    return jsonify(source)
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5003)
\ No newline at end of file
+    # Development server; see gunicorn.conf.py for production.
+    warm_up()
+    app.run(debug=True, port=5003)
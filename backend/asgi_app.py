@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from services.brain import QueryBrain
+from services.es_client import CircuitOpenError, create_async_client
+from services.search_engine import AsyncSearchEngine, parse_paging, next_cursor
+
+# ASGI variant of app.py: run with `uvicorn asgi_app:app --port 5003`.
+
+logger = logging.getLogger(__name__)
+
+LLM_LATENCY_BUDGET_MS = int(os.environ.get("LLM_LATENCY_BUDGET_MS", "800"))
+
+es = create_async_client()
+brain = QueryBrain()
+engine = AsyncSearchEngine(es)
+
+
+def _format(entities, results, paging, speculative=False):
+    return {
+        "interpretation": entities,
+        "trials": [hit['_source'] for hit in results['hits']['hits']],
+        "total": results['hits']['total']['value'],
+        "page": paging["page"],
+        "page_size": paging["page_size"],
+        "next_cursor": next_cursor(results, paging["page_size"]),
+        "speculative": speculative,
+    }
+
+
+def _discard_result(task):
+    if not task.cancelled():
+        task.exception()
+
+
+async def search(request):
+    user_query = request.query_params.get('q', '')
+    try:
+        paging = parse_paging(request.query_params)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    entities, rule_entities = brain.local_entities(user_query)
+    if entities is not None:
+        # Rule fast path or cached extraction: nothing to wait for, so nothing to speculate on.
+        results = await engine.execute(entities, **paging)
+        return JSONResponse(_format(entities, results, paging))
+
+    extraction = asyncio.create_task(brain.extract_with_llm_async(user_query, rule_entities))
+    # Free-text multi_match runs while the LLM is thinking so we have an answer
+    # ready if extraction blows the latency budget.
+    fallback_entities = {"keyword": user_query}
+    speculative = asyncio.create_task(engine.execute(fallback_entities, **paging))
+
+    try:
+        entities = await asyncio.wait_for(asyncio.shield(extraction), LLM_LATENCY_BUDGET_MS / 1000)
+    except asyncio.TimeoutError:
+        # The extraction keeps running in the background and lands in the entity
+        # cache, so a repeat of this query takes the fast path.
+        logger.info(f"Entity extraction exceeded {LLM_LATENCY_BUDGET_MS}ms, serving speculative results")
+        return JSONResponse(_format(fallback_entities, await speculative, paging, speculative=True))
+
+    speculative.cancel()
+    # Retrieve the outcome, so a speculative search that had already failed is not reported as unhandled.
+    speculative.add_done_callback(_discard_result)
+    results = await engine.execute(entities, **paging)
+    return JSONResponse(_format(entities, results, paging))
+
+
+async def trial(request):
+    nct_id = request.path_params['nct_id']
+    source = await engine.get_trial(nct_id)
+    if source is None:
+        return JSONResponse({"error": f"Trial {nct_id} not found"}, status_code=404)
+    return JSONResponse(source)
+
+
+async def es_unavailable(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=503)
+
+
+async def shutdown():
+    await es.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/search', search, methods=['GET']),
+        Route('/trial/{nct_id}', trial, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'])],
+    exception_handlers={CircuitOpenError: es_unavailable},
+    on_shutdown=[shutdown],
+)
@@ -0,0 +1,73 @@
+"""
+Bursty LLM extraction with and without request coalescing, against the stub Bedrock client.
+
+    python -m benchmarks.coalescing --burst 64 --distinct 24 --llm-latency-ms 600
+
+Fires `burst` concurrent extractions drawn from `distinct` different queries (so
+duplicates are in flight together) and reports Bedrock calls, prompt bytes and
+latency for one-call-per-query versus the micro-batching coalescer. No AWS or ES needed.
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import latency_summary
+from benchmarks.load_test import load_query_mix
+from benchmarks.stub_bedrock import StubBedrock
+from services.brain import LLM_BATCH_MAX, LLM_MAX_CONCURRENCY, QueryBrain
+from services.entity_cache import EntityCache
+from services.llm_batcher import ExtractionCoalescer
+
+
+def run(queries, latency_ms, window_ms):
+    stub = StubBedrock(latency_ms)
+    brain = QueryBrain(cache=EntityCache(max_size=1), bedrock=stub)
+    # Every query must reach the LLM: no rule fast path, no cache hits.
+    brain.local_entities = lambda query: (None, {})
+    brain.coalescer = ExtractionCoalescer(brain._invoke_batch, window_ms, LLM_BATCH_MAX, LLM_MAX_CONCURRENCY) \
+        if window_ms > 0 else None
+
+    def timed(query):
+        started = time.perf_counter()
+        entities = brain.extract_entities(query)
+        return (time.perf_counter() - started) * 1000, entities
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        results = list(pool.map(timed, queries))
+    elapsed = time.perf_counter() - started
+    report = {
+        "bedrock_calls": stub.calls,
+        "prompt_kb": round(stub.prompt_bytes / 1024, 1),
+        "wall_seconds": round(elapsed, 2),
+        **latency_summary([ms for ms, _ in results]),
+    }
+    if brain.coalescer is not None:
+        report["coalescer"] = brain.coalescer.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=24)
+    parser.add_argument("--llm-latency-ms", type=float, default=600)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool, _ = load_query_mix()
+    distinct = pool[:args.distinct]
+    queries = [rng.choice(distinct) for _ in range(args.burst)]
+
+    report = {
+        "per_query": run(queries, args.llm_latency_ms, 0),
+        "coalesced": run(queries, args.llm_latency_ms, args.window_ms),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
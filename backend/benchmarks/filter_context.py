@@ -0,0 +1,67 @@
+"""
+Compare QPS of the filter-context query layout against the old all-`must` layout.
+
+    python -m benchmarks.filter_context --docs 500000 --queries 2000 --threads 8
+
+Builds a synthetic index (skipped with --reuse), then replays the same entity mix
+through both layouts. Run from backend/ against a local ES container.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from elasticsearch import helpers
+from indexer import get_mapping
+from services.es_client import create_client
+from services.search_engine import SearchEngine
+from benchmarks.synthetic import entity_mix, synthetic_trials
+
+BENCH_INDEX = "clinical_trials_bench"
+
+
+def all_must(body):
+    query = dict(body)
+    bool_query = query["query"]["bool"]
+    query["query"] = {"bool": {"must": bool_query["must"] + bool_query["filter"]}}
+    return query
+
+
+def run(es, bodies, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        took = list(pool.map(lambda body: es.search(index=BENCH_INDEX, body=body)["took"], bodies))
+    elapsed = time.perf_counter() - start
+    return {"qps": round(len(bodies) / elapsed, 1), "mean_took_ms": round(sum(took) / len(took), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="http://localhost:9200")
+    parser.add_argument("--docs", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reuse", action="store_true", help="Skip building the synthetic index")
+    args = parser.parse_args()
+
+    es = create_client(args.host, request_timeout=120)
+    if not args.reuse:
+        if es.indices.exists(index=BENCH_INDEX):
+            es.indices.delete(index=BENCH_INDEX)
+        es.indices.create(index=BENCH_INDEX, body=get_mapping())
+        helpers.bulk(es, synthetic_trials(args.docs, BENCH_INDEX), chunk_size=2000)
+        es.indices.refresh(index=BENCH_INDEX)
+
+    engine = SearchEngine(es)
+    bodies = [engine.build_query(entities) for entities in entity_mix(args.queries)]
+    # Warm both layouts once so neither pays for cold segments.
+    run(es, bodies[:100], args.threads)
+    run(es, [all_must(b) for b in bodies[:100]], args.threads)
+
+    legacy = run(es, [all_must(b) for b in bodies], args.threads)
+    current = run(es, bodies, args.threads)
+    print(f"all-must:       {legacy}")
+    print(f"must + filter:  {current}")
+    print(f"QPS gain:       {current['qps'] / legacy['qps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Offline load tests: /search throughput and latency, and indexing docs/s.
+
+Everything runs on one Linux box against a local ES container, e.g.
+
+    docker run -d -p 9200:9200 -e discovery.type=single-node -e xpack.security.enabled=false \\
+        docker.elastic.co/elasticsearch/elasticsearch:8.13.4
+
+From backend/:
+
+    python -m benchmarks.load_test index --docs 200000 --out runs/index.json
+    python -m benchmarks.load_test serve --llm-latency-ms 600 --llm-jitter-ms 200 &
+    python -m benchmarks.load_test search --concurrency 16 --duration 60 --out runs/search.json
+    python -m benchmarks.load_test compare runs/search_before.json runs/search.json
+
+`serve` runs the Flask API with Bedrock replaced by benchmarks.stub_bedrock, so
+extraction latency is controlled and no AWS calls are made. `search` replays the
+recorded query mix (benchmarks/query_mix.jsonl, sampled by weight) and reports QPS
+and p50/p95/p99. Reports are JSON with the git revision and host details.
+`index` does a real full load (alias swap and manifest included) behind the scratch
+alias load_test_trials with a temporary manifest, and deletes it afterwards.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+from benchmarks.common import latency_summary, write_report
+
+QUERY_MIX = Path(__file__).resolve().parent / "query_mix.jsonl"
+# `index` loads behind this alias; its prefix must not match the served clinical_trials_es_* generations.
+SCRATCH_ALIAS = "load_test_trials"
+
+
+def run_metadata(args):
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": revision,
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k != "func"},
+    }
+
+
+def load_query_mix(path=QUERY_MIX):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [e["q"] for e in entries], [e.get("weight", 1) for e in entries]
+
+
+class SearchWorker(threading.Thread):
+    """One keep-alive connection issuing /search requests until the deadline or request budget runs out."""
+
+    def __init__(self, url, queries, weights, params, deadline, budget, seed):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.queries, self.weights, self.params = queries, weights, params
+        self.deadline, self.budget = deadline, budget
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while time.monotonic() < self.deadline and self.budget.take():
+            query = self.rng.choices(self.queries, self.weights)[0]
+            path = "/search?" + urlencode({"q": query, **self.params})
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                continue
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        conn.close()
+
+
+class RequestBudget:
+    def __init__(self, total=None):
+        self.remaining = total
+        self.lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def drive_search(url, queries, weights, params, concurrency, duration, requests=None, seed=1):
+    deadline = time.monotonic() + duration
+    budget = RequestBudget(requests)
+    workers = [SearchWorker(url, queries, weights, params, deadline, budget, seed + i) for i in range(concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for worker in workers for ms in worker.latencies]
+    statuses = {}
+    for worker in workers:
+        for status, count in worker.statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+    return {
+        "requests": len(latencies),
+        "errors": sum(worker.errors for worker in workers),
+        "statuses": statuses,
+        "seconds": round(elapsed, 2),
+        "qps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        **latency_summary(latencies),
+    }
+
+
+def cmd_search(args):
+    queries, weights = load_query_mix(args.mix)
+    params = {"page_size": args.page_size}
+    if args.mode:
+        params["mode"] = args.mode
+    if args.warmup:
+        drive_search(args.url, queries, weights, params, args.concurrency, args.warmup)
+    report = run_metadata(args)
+    report["search"] = drive_search(args.url, queries, weights, params, args.concurrency, args.duration,
+                                    args.requests, args.seed)
+    write_report(report, args.out)
+
+
+def cmd_index(args):
+    import indexer
+    from benchmarks.synthetic import write_dump
+
+    report = run_metadata(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = Path(args.data) if args.data else Path(write_dump(Path(tmp) / "trials.ndjson", args.docs))
+        started = time.perf_counter()
+        # Scratch alias and manifest, so the served alias and the real delta manifest are left alone.
+        indexer.index_data(dump, workers=args.workers, thread_count=args.threads, chunk_size=args.chunk_size,
+                           force=True, mapping_profile=args.mapping_profile, alias=SCRATCH_ALIAS,
+                           manifest_path=Path(tmp) / "manifest.sqlite")
+        elapsed = time.perf_counter() - started
+        indexed = indexer.es.count(index=SCRATCH_ALIAS)["count"]
+        for name in indexer.list_generations(SCRATCH_ALIAS):
+            indexer.es.indices.delete(index=name)
+        report["index"] = {
+            "docs": indexed,
+            "dump_bytes": dump.stat().st_size,
+            "seconds": round(elapsed, 1),
+            "docs_per_second": round(indexed / elapsed) if elapsed else 0,
+        }
+    write_report(report, args.out)
+
+
+def cmd_serve(args):
+    import app as api
+    from benchmarks.stub_bedrock import StubBedrock
+    from services.brain import QueryBrain
+
+    api.brain = QueryBrain(bedrock=StubBedrock(args.llm_latency_ms, args.llm_jitter_ms, args.llm_error_rate))
+    api.warm_up()
+    api.app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+def cmd_compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    for section in ("search", "index"):
+        if section not in before or section not in after:
+            continue
+        print(f"[{section}] {before.get('git_revision')} -> {after.get('git_revision')}")
+        for key, old in before[section].items():
+            new = after[section].get(key)
+            if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+                print(f"  {key:>16}: {old:>10} -> {new:>10}  ({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="Replay the query mix against a running API")
+    search.add_argument("--url", default="http://127.0.0.1:5003")
+    search.add_argument("--mix", default=QUERY_MIX, help="JSONL of {\"q\": ..., \"weight\": ...}")
+    search.add_argument("--concurrency", type=int, default=8)
+    search.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    search.add_argument("--requests", type=int, help="Stop after this many requests instead")
+    search.add_argument("--warmup", type=float, default=5, help="Seconds of unrecorded warm-up")
+    search.add_argument("--page-size", type=int, default=20)
+    search.add_argument("--mode", choices=("keyword", "hybrid", "semantic"))
+    search.add_argument("--seed", type=int, default=1)
+    search.add_argument("--out", help="Write the report as JSON to this path")
+    search.set_defaults(func=cmd_search)
+
+    index = commands.add_parser("index", help="Time a full indexer.py load of a synthetic dump")
+    index.add_argument("--docs", type=int, default=100_000)
+    index.add_argument("--data", help="Index this dump instead of generating one")
+    index.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    index.add_argument("--threads", type=int, default=4)
+    index.add_argument("--chunk-size", type=int, default=1000)
+    index.add_argument("--mapping-profile", default="lean")
+    index.add_argument("--out", help="Write the report as JSON to this path")
+    index.set_defaults(func=cmd_index)
+
+    serve = commands.add_parser("serve", help="Run the API with a stub Bedrock client")
+    serve.add_argument("--port", type=int, default=5003)
+    serve.add_argument("--llm-latency-ms", type=float, default=600)
+    serve.add_argument("--llm-jitter-ms", type=float, default=0)
+    serve.add_argument("--llm-error-rate", type=float, default=0.0)
+    serve.set_defaults(func=cmd_serve)
+
+    compare = commands.add_parser("compare", help="Diff two JSON reports")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
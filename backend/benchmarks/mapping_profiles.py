@@ -0,0 +1,75 @@
+"""
+Size and latency report for the 'full' vs 'lean' mapping profiles.
+
+    python -m benchmarks.mapping_profiles --docs 100000 --queries 1000 --out mapping_report.json
+
+Loads the same synthetic corpus into one index per profile, force-merges both to a
+single segment so store sizes are comparable, then replays one query mix against each.
+Run from backend/ against a local ES container.
+"""
+import argparse
+import time
+from elasticsearch import helpers
+from indexer import MAPPING_PROFILES, get_mapping
+from services.es_client import create_client
+from services.search_engine import SearchEngine
+from benchmarks.common import percentile, write_report
+from benchmarks.synthetic import entity_mix, synthetic_trials
+
+
+def load(es, index, profile, docs):
+    if es.indices.exists(index=index):
+        es.indices.delete(index=index)
+    mapping = get_mapping(profile)
+    # Single node: no replicas for either profile so the sizes compare primaries only.
+    mapping.setdefault("settings", {}).setdefault("index", {})["number_of_replicas"] = 0
+    es.indices.create(index=index, body=mapping)
+    started = time.perf_counter()
+    helpers.bulk(es, synthetic_trials(docs, index), chunk_size=1000)
+    es.indices.refresh(index=index)
+    elapsed = time.perf_counter() - started
+    es.indices.forcemerge(index=index, max_num_segments=1)
+    stats = es.indices.stats(index=index)["_all"]["primaries"]
+    return {
+        "index_seconds": round(elapsed, 1),
+        "docs_per_second": round(docs / elapsed),
+        "store_bytes": stats["store"]["size_in_bytes"],
+        # Includes hidden nested docs, which is what the lean profile mostly removes.
+        "lucene_docs": stats["docs"]["count"],
+    }
+
+
+def query_latency(es, index, bodies):
+    took = [es.search(index=index, body=body, request_cache=False)["took"] for body in bodies]
+    return {"mean_ms": round(sum(took) / len(took), 2), "p50_ms": percentile(took, 50), "p95_ms": percentile(took, 95)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="http://localhost:9200")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--out", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    es = create_client(args.host, request_timeout=300)
+    engine = SearchEngine(es)
+    bodies = [engine.build_query(entities) for entities in entity_mix(args.queries)]
+
+    report = {"docs": args.docs, "queries": args.queries, "profiles": {}}
+    for profile in MAPPING_PROFILES:
+        index = f"clinical_trials_mapping_{profile}"
+        result = load(es, index, profile, args.docs)
+        query_latency(es, index, bodies[:100])
+        result.update(query_latency(es, index, bodies))
+        report["profiles"][profile] = result
+        es.indices.delete(index=index)
+
+    full, lean = report["profiles"]["full"], report["profiles"]["lean"]
+    report["store_ratio"] = round(lean["store_bytes"] / full["store_bytes"], 3)
+    report["mean_latency_ratio"] = round(lean["mean_ms"] / max(full["mean_ms"], 0.01), 3)
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Compare records/s of the original per-trial loop from indexer.py against the
+row-at-a-time normalize_trial path and normalize_batch.
+
+    python -m benchmarks.normalization --records 200000 --batch-size 500
+
+Runs offline on synthetic raw records shaped like the ClinicalTrials.gov export. It
+checks normalize_trial and normalize_batch produce identical sources, and that both
+match the original loop on everything except the derived suggest field and
+minimum_age/maximum_age, which are now unit-aware ("6 Months" is 0 years, not 6).
+"""
+import argparse
+import gc
+import random
+import time
+from normalization import _add_suggestions, normalize_batch, normalize_trial
+
+HEALTHY_VOLUNTEERS = ["Accepts Healthy Volunteers", "No", "NA", "", "Yes", None]
+AGES = ["18 Years", "65 Years", "6 Months", "N/A", "NA", "2 Weeks", "12 Years", "", None, "UNKNOWN"]
+ENROLLMENTS = ["100", "1,200", 40, 250.0, "NA", None]
+COUNTS = ["2", "1", "NA", None, "", 3]
+FLAGS = [True, False, "true", "False", "yes", 1, 0, None]
+DATES = ["2020-01-15", "2019-06", "NA", "", None, "2023-12-01"]
+
+AGE_FIELDS = ("minimum_age", "maximum_age")
+# Derived fields the original loop never produced: completion inputs for /suggest.
+DERIVED_FIELDS = ("suggest",)
+
+# The loop indexer.py ran before normalization.py, kept verbatim as the baseline.
+LEGACY_FIELDS_TO_KEEP = frozenset({
+    "nct_id", "acronym", "source",
+    "brief_title", "official_title",
+    "overall_status", "phase",
+    "study_type", "primary_purpose", "allocation", "intervention_model", "intervention_model_description",
+    "masking", "subject_masked", "caregiver_masked", "investigator_masked", "outcomes_assessor_masked",
+    "enrollment", "minimum_age", "maximum_age", "gender", "healthy_volunteers",
+    "number_of_arms", "number_of_groups",
+    "start_date", "completion_date", "primary_completion_date",
+    "has_results",
+    "conditions", "sponsors", "facilities", "interventions", "design_outcomes", "design_groups"
+})
+
+
+def legacy_normalize_trial(trial):
+    source = trial.copy()
+
+    hv_val = str(source.get("healthy_volunteers", "")).upper()
+    if "ACCEPT" in hv_val or hv_val == "YES" or hv_val == "TRUE":
+        source["healthy_volunteers"] = True
+    elif "NA" in hv_val or not hv_val:
+        source.pop("healthy_volunteers", None)
+    else:
+        source["healthy_volunteers"] = False
+    e_val = source.get("enrollment")
+    if e_val is not None:
+        try:
+            source["enrollment"] = int(float(str(e_val).replace(',', '')))
+        except (ValueError, TypeError):
+            source["enrollment"] = None
+
+    for age_field in ["minimum_age", "maximum_age"]:
+        age_str = source.get(age_field, "")
+        if age_str and age_str != "NA" and str(age_str).upper() not in ["UNKNOWN", "NULL", ""]:
+            try:
+                age_num = int(''.join(filter(str.isdigit, str(age_str))))
+                source[age_field] = age_num
+            except (ValueError, TypeError):
+                source.pop(age_field, None)
+        else:
+            source.pop(age_field, None)
+
+    for num_field in ["number_of_arms", "number_of_groups"]:
+        val = source.get(num_field)
+        if val is not None and val not in ["NA", "None", "null", ""]:
+            try:
+                source[num_field] = int(str(val))
+            except (ValueError, TypeError):
+                source.pop(num_field, None)
+        else:
+            source.pop(num_field, None)
+
+    for bool_field in ["subject_masked", "caregiver_masked", "investigator_masked",
+                      "outcomes_assessor_masked", "has_results"]:
+        val = source.get(bool_field)
+        if val is not None:
+            if isinstance(val, bool):
+                source[bool_field] = val
+            elif isinstance(val, (int, float)):
+                source[bool_field] = bool(val)
+            elif isinstance(val, str):
+                source[bool_field] = val.lower() in ["true", "yes", "1"]
+            else:
+                source.pop(bool_field, None)
+        else:
+            source.pop(bool_field, None)
+
+    for d_field in ["start_date", "completion_date", "primary_completion_date"]:
+        val = source.get(d_field)
+        if not val or str(val).upper() in ["NA", "NULL", "UNKNOWN", ""]:
+            source.pop(d_field, None)
+
+    if isinstance(source.get("conditions"), list):
+        source["conditions"] = [
+            c.get("name", str(c)) if isinstance(c, dict) else str(c)
+            for c in source["conditions"]
+        ]
+
+    return {k: v for k, v in source.items() if k in LEGACY_FIELDS_TO_KEEP}
+
+
+def comparable(source):
+    return {k: v for k, v in source.items() if k not in AGE_FIELDS and k not in DERIVED_FIELDS}
+
+
+def raw_trials(count, seed=3):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "nct_id": f"NCT{i:08d}",
+            "brief_title": f"Study {i}",
+            "overall_status": "RECRUITING",
+            "healthy_volunteers": rng.choice(HEALTHY_VOLUNTEERS),
+            "enrollment": rng.choice(ENROLLMENTS),
+            "minimum_age": rng.choice(AGES),
+            "maximum_age": rng.choice(AGES),
+            "number_of_arms": rng.choice(COUNTS),
+            "number_of_groups": rng.choice(COUNTS),
+            "subject_masked": rng.choice(FLAGS),
+            "caregiver_masked": rng.choice(FLAGS),
+            "investigator_masked": rng.choice(FLAGS),
+            "outcomes_assessor_masked": rng.choice(FLAGS),
+            "has_results": rng.choice(FLAGS),
+            "start_date": rng.choice(DATES),
+            "completion_date": rng.choice(DATES),
+            "primary_completion_date": rng.choice(DATES),
+            "conditions": [{"name": "Asthma"}, "Obesity"],
+            "dropped_field": "not indexed",
+        }
+
+
+def timed(run):
+    # As timeit does: without this, each path pays for collecting the previous paths' output.
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = run()
+        return result, time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    trials = list(raw_trials(args.records))
+    batches = [trials[i:i + args.batch_size] for i in range(0, len(trials), args.batch_size)]
+
+    legacy, legacy_elapsed = timed(lambda: [legacy_normalize_trial(trial) for trial in trials])
+    # The same loop plus the /suggest completion inputs normalization now also derives.
+    _, legacy_suggest_elapsed = timed(lambda: [_add_suggestions(legacy_normalize_trial(trial)) for trial in trials])
+    row, row_elapsed = timed(lambda: [normalize_trial(trial) for trial in trials])
+    columnar, columnar_elapsed = timed(lambda: [source for batch in batches for source in normalize_batch(batch)])
+
+    assert row == columnar, "normalize_batch output differs from normalize_trial"
+    mismatches = [trial["nct_id"] for trial, old, new in zip(trials, legacy, row) if comparable(old) != comparable(new)]
+    assert not mismatches, f"{len(mismatches)} sources differ from the original loop beyond ages, e.g. {mismatches[:5]}"
+    age_changes = sum(any(old.get(f) != new.get(f) for f in AGE_FIELDS) for old, new in zip(legacy, row))
+    print(f"original loop:           {len(trials) / legacy_elapsed:,.0f} records/s")
+    print(f"original loop + suggest: {len(trials) / legacy_suggest_elapsed:,.0f} records/s")
+    print(f"row-at-a-time:           {len(trials) / row_elapsed:,.0f} records/s")
+    print(f"columnar:                {len(trials) / columnar_elapsed:,.0f} records/s")
+    print(f"speedup:                 {legacy_suggest_elapsed / columnar_elapsed:.2f}x over the original loop doing "
+          f"the same work ({legacy_elapsed / columnar_elapsed:.2f}x over the bare loop)")
+    print(f"ages changed:            {age_changes} of {len(trials)} records (unit-aware parsing)")
+
+
+if __name__ == "__main__":
+    main()
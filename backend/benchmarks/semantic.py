@@ -0,0 +1,105 @@
+"""
+Recall and latency of HNSW kNN, plus latency of the keyword/hybrid/semantic search modes.
+
+    python -m benchmarks.semantic --docs 100000 --queries 500 --k 20 --out semantic_report.json
+
+Loads a synthetic corpus with embeddings from the configured encoder (EMBEDDING_ENCODER),
+then measures recall@k of the approximate kNN search against an exact brute-force
+cosine scan, and replays one query mix through each SearchEngine mode.
+Run from backend/ against a local ES container.
+"""
+import argparse
+import time
+from elasticsearch import helpers
+from indexer import embed_actions, get_mapping
+from services.embeddings import get_encoder
+from services.es_client import create_client
+from services.search_engine import SEARCH_MODES, SearchEngine
+from benchmarks.common import percentile, write_report
+from benchmarks.synthetic import entity_mix, synthetic_trials
+
+BENCH_INDEX = "clinical_trials_semantic_bench"
+
+
+def load(es, encoder, docs):
+    if es.indices.exists(index=BENCH_INDEX):
+        es.indices.delete(index=BENCH_INDEX)
+    es.indices.create(index=BENCH_INDEX, body=get_mapping("full", encoder.dims))
+    started = time.perf_counter()
+    helpers.bulk(es, embed_actions(synthetic_trials(docs, BENCH_INDEX), encoder), chunk_size=500)
+    es.indices.refresh(index=BENCH_INDEX)
+    elapsed = time.perf_counter() - started
+    return {"index_seconds": round(elapsed, 1), "docs_per_second": round(docs / elapsed)}
+
+
+def exact_neighbours(es, vector, k):
+    body = {
+        "size": k,
+        "_source": False,
+        "query": {
+            "script_score": {
+                "query": {"match_all": {}},
+                "script": {"source": "cosineSimilarity(params.v, 'embedding') + 1.0", "params": {"v": vector}},
+            }
+        },
+    }
+    return [hit['_id'] for hit in es.search(index=BENCH_INDEX, body=body)['hits']['hits']]
+
+
+def knn_recall(es, engine, texts, k):
+    recalls, took = [], []
+    for vector in engine.encoder.encode(texts):
+        exact = set(exact_neighbours(es, vector, k))
+        body = engine.build_knn_query({}, vector, k)
+        body["_source"] = False
+        response = es.search(index=BENCH_INDEX, body=body)
+        took.append(response['took'])
+        approximate = {hit['_id'] for hit in response['hits']['hits']}
+        recalls.append(len(exact & approximate) / max(len(exact), 1))
+    return {
+        f"recall_at_{k}": round(sum(recalls) / len(recalls), 4),
+        "knn_p50_ms": percentile(took, 50),
+        "knn_p95_ms": percentile(took, 95),
+    }
+
+
+def mode_latency(engine, entities_list, mode):
+    wall = []
+    for entities in entities_list:
+        started = time.perf_counter()
+        engine.execute(entities, mode=mode)
+        wall.append((time.perf_counter() - started) * 1000)
+    return {"mean_ms": round(sum(wall) / len(wall), 2), "p50_ms": round(percentile(wall, 50), 2),
+            "p95_ms": round(percentile(wall, 95), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="http://localhost:9200")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--reuse", action="store_true", help="Skip building the synthetic index")
+    parser.add_argument("--out", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    es = create_client(args.host, request_timeout=300)
+    encoder = get_encoder()
+    report = {"encoder": encoder.name, "dims": encoder.dims, "docs": args.docs}
+    if not args.reuse:
+        report["load"] = load(es, encoder, args.docs)
+
+    engine = SearchEngine(es, encoder=encoder)
+    engine.index = BENCH_INDEX
+    entities_list = entity_mix(args.queries)
+    report["knn"] = knn_recall(es, engine, [e["condition"] for e in entities_list], args.k)
+    # Warm-up pass so no mode pays for cold segments.
+    for mode in SEARCH_MODES:
+        mode_latency(engine, entities_list[:50], mode)
+    report["modes"] = {mode: mode_latency(engine, entities_list, mode) for mode in SEARCH_MODES}
+
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Local stand-in for the bedrock-runtime client, so load tests never touch AWS.
+
+    brain = QueryBrain(bedrock=StubBedrock(latency_ms=600, jitter_ms=200))
+
+invoke_model() sleeps for the configured latency, then answers in the Anthropic
+messages response shape with entities taken from the rule extractor (plus the raw
+query as the condition when the rules find none), which is close enough in size
+and shape to exercise everything downstream of the LLM. Batched prompts get a
+JSON array with one object per numbered query.
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+from services.rule_extractor import RuleExtractor
+
+_QUERY_RE = re.compile(r'this query: "(.*?)"\n', re.DOTALL)
+# Batched prompts list one JSON-encoded query per numbered line.
+_NUMBERED_RE = re.compile(r'^\s*\d+\. (".*")$', re.MULTILINE)
+
+
+class StubBedrock:
+    def __init__(self, latency_ms=600, jitter_ms=0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.rules = RuleExtractor()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.prompt_bytes = 0
+
+    def _entities(self, query):
+        entities, _ = self.rules.extract(query)
+        entities = dict(entities)
+        entities.setdefault("condition", query)
+        return entities
+
+    def invoke_model(self, body, modelId=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.prompt_bytes += len(body)
+            delay = self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self.rng.random() < self.error_rate
+        time.sleep(max(delay, 0) / 1000)
+        if fail:
+            raise RuntimeError("ThrottlingException: stub Bedrock rejected the call")
+
+        prompt = json.loads(body)["messages"][0]["content"]
+        numbered = _NUMBERED_RE.findall(prompt)
+        if numbered:
+            text = json.dumps([self._entities(json.loads(query)) for query in numbered])
+        else:
+            match = _QUERY_RE.search(prompt)
+            text = json.dumps(self._entities(match.group(1) if match else ""))
+        payload = {"content": [{"type": "text", "text": text}], "stop_reason": "end_turn"}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
@@ -0,0 +1,136 @@
+"""
+Synthetic ClinicalTrials.gov-shaped documents and entity mixes for the benchmarks.
+
+    python -m benchmarks.synthetic --count 1000000 --out data/synthetic_trials.ndjson
+
+writes a raw dump (every field get_mapping() declares) that indexer.py --data can load.
+"""
+import argparse
+import json
+import random
+
+PHASES = ["PHASE1", "PHASE2", "PHASE3", "PHASE4"]
+STATUSES = ["RECRUITING", "COMPLETED", "NOT_YET_RECRUITING", "ACTIVE_NOT_RECRUITING", "SUSPENDED", "WITHDRAWN"]
+STUDY_TYPES = ["INTERVENTIONAL", "OBSERVATIONAL"]
+PURPOSES = ["TREATMENT", "PREVENTION", "DIAGNOSTIC", "SCREENING", "SUPPORTIVE"]
+MASKINGS = ["OPEN", "SINGLE", "DOUBLE", "TRIPLE", "QUADRUPLE"]
+INTERVENTION_TYPES = ["DRUG", "DEVICE", "BEHAVIORAL", "PROCEDURE"]
+AGENCY_CLASSES = ["INDUSTRY", "NIH", "OTHER", "FED"]
+CONDITIONS = ["Asthma", "Breast Cancer", "Diabetes", "Hypertension", "Melanoma", "Obesity",
+              "Heart Failure", "Depression", "HIV", "Alzheimer Disease", "Lung Cancer", "COPD"]
+SPONSORS = ["National Cancer Institute", "Pfizer", "Novartis", "Mayo Clinic", "Merck Sharp & Dohme",
+            "AstraZeneca", "University of Miami", "Stanford University"]
+LOCATIONS = [("Miami", "Florida", "United States"), ("Boston", "Massachusetts", "United States"),
+             ("Houston", "Texas", "United States"), ("Chicago", "Illinois", "United States"),
+             ("Seattle", "Washington", "United States"), ("Toronto", "Ontario", "Canada"),
+             ("London", None, "United Kingdom"), ("Paris", None, "France")]
+WORDS = ("safety efficacy randomized placebo controlled dose escalation pharmacokinetics adults "
+         "quality of life survival response rate adverse events biomarker cohort follow-up").split()
+
+
+def _sentence(rng, words=20):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_trial(i, rng):
+    condition = rng.choice(CONDITIONS)
+    min_age = rng.choice([0, 18, 18, 40, 65])
+    status = rng.choice(STATUSES)
+    facilities = []
+    for _ in range(rng.choice([1, 1, 2, 3, 5, 10, 40])):
+        city, state, country = rng.choice(LOCATIONS)
+        facilities.append({"name": f"{city} Research Site {rng.randint(1, 99)}", "status": status,
+                           "city": city, "state": state, "country": country})
+    return {
+        "nct_id": f"NCT{i:08d}",
+        "acronym": None,
+        "source": rng.choice(SPONSORS),
+        "brief_title": f"A Study of Treatment {i % 997} in {condition}",
+        "official_title": f"Randomized Evaluation of Compound {i % 991} for {condition}",
+        "overall_status": status,
+        "phase": rng.choice(PHASES),
+        "study_type": rng.choice(STUDY_TYPES),
+        "primary_purpose": rng.choice(PURPOSES),
+        "allocation": "RANDOMIZED",
+        "intervention_model": "PARALLEL",
+        "intervention_model_description": _sentence(rng, 30),
+        "masking": rng.choice(MASKINGS),
+        "subject_masked": rng.random() < 0.5,
+        "caregiver_masked": rng.random() < 0.3,
+        "investigator_masked": rng.random() < 0.4,
+        "outcomes_assessor_masked": rng.random() < 0.4,
+        "enrollment": rng.randint(5, 2000),
+        "minimum_age": min_age,
+        "maximum_age": min_age + rng.choice([17, 47, 64, 100]),
+        "gender": rng.choice(["ALL", "FEMALE", "MALE"]),
+        "healthy_volunteers": rng.random() < 0.2,
+        "number_of_arms": rng.randint(1, 4),
+        "number_of_groups": rng.choice([None, None, 1, 2, 3]),
+        "start_date": f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "primary_completion_date": f"20{rng.randint(25, 28)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "completion_date": f"20{rng.randint(28, 32)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "has_results": rng.random() < 0.3,
+        "conditions": [condition],
+        "sponsors": [{"name": rng.choice(SPONSORS), "agency_class": rng.choice(AGENCY_CLASSES),
+                      "lead_or_collaborator": "lead"}],
+        "facilities": facilities,
+        "interventions": [{"id": str(rng.randint(1, 10 ** 6)), "intervention_type": rng.choice(INTERVENTION_TYPES),
+                           "name": f"Compound {i % 991}", "description": _sentence(rng, 40)}],
+        "design_outcomes": [{"outcome_type": rng.choice(["PRIMARY", "SECONDARY"]), "measure": _sentence(rng, 8),
+                             "time_frame": f"{rng.randint(1, 52)} weeks", "description": _sentence(rng, 40)}
+                            for _ in range(rng.randint(1, 8))],
+        "design_groups": [{"id": str(rng.randint(1, 10 ** 6)), "group_type": rng.choice(["EXPERIMENTAL", "PLACEBO_COMPARATOR"]),
+                           "title": f"Arm {g}", "description": _sentence(rng, 30)}
+                          for g in range(rng.randint(1, 4))],
+    }
+
+
+def synthetic_trials(count, index, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {"_index": index, "_id": f"NCT{i:08d}", "_source": synthetic_trial(i, rng)}
+
+
+def entity_mix(count, seed=11):
+    rng = random.Random(seed)
+    mix = []
+    for _ in range(count):
+        entities = {"condition": rng.choice(CONDITIONS), "phase": rng.choice(PHASES)}
+        if rng.random() < 0.5:
+            entities["overall_status"] = rng.choice(STATUSES)
+        if rng.random() < 0.4:
+            entities["study_type"] = rng.choice(STUDY_TYPES)
+        if rng.random() < 0.4:
+            entities["masking"] = rng.choice(MASKINGS)
+        if rng.random() < 0.3:
+            entities["min_age"], entities["max_age"] = 18, 65
+        if rng.random() < 0.3:
+            entities["enrollment_size"] = rng.choice(["small", "medium", "large"])
+        if rng.random() < 0.3:
+            entities["city"] = rng.choice(LOCATIONS)[0]
+        mix.append(entities)
+    return mix
+
+
+def write_dump(path, count, seed=7):
+    """Raw trials as NDJSON, in the shape of the registry dump indexer.py reads."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps(synthetic_trial(i, rng)))
+            f.write("\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="data/synthetic_trials.ndjson")
+    args = parser.parse_args()
+    write_dump(args.out, args.count, args.seed)
+    print(f"Wrote {args.count} synthetic trials to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
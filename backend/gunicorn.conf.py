@@ -0,0 +1,51 @@
+"""
+Production server settings, picked up automatically by `cd backend && gunicorn app:app`.
+
+Workers are pre-forked and each imports app.py itself (no preload_app), so every
+process gets its own ES connection pool, boto3 client, SQLite handles and thread
+pools rather than sharing ones created before the fork. Each worker runs
+app.warm_up() before it accepts connections and app.shutdown() once it has drained.
+
+SIGTERM marks the worker as draining straight away (app.begin_drain(), so /readyz
+turns 503) and then finishes in-flight requests for up to WEB_GRACEFUL_TIMEOUT seconds
+before exiting. SIGHUP replaces the workers with freshly warmed ones.
+"""
+import os
+import signal
+import sys
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:5003")
+workers = int(os.environ.get("WEB_WORKERS", str(os.cpu_count() or 1)))
+# Requests mostly wait on Bedrock and ES, so each worker serves several at once.
+threads = int(os.environ.get("WEB_THREADS", "8"))
+worker_class = "gthread"
+# Warm-up runs before a worker's first heartbeat, so it has to finish within this.
+timeout = int(os.environ.get("WEB_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", "5"))
+# Recycle workers after this many requests (0 never does); jitter keeps them from restarting together.
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("WEB_ACCESS_LOG")
+
+
+def post_worker_init(worker):
+    import app
+
+    app.warm_up()
+    handle_exit = worker.handle_exit
+
+    def drain_then_exit(sig, frame):
+        app.begin_drain()
+        handle_exit(sig, frame)
+
+    # The worker bound SIGTERM to its own handle_exit before this hook ran, so rebind it.
+    signal.signal(signal.SIGTERM, drain_then_exit)
+    signal.siginterrupt(signal.SIGTERM, False)
+
+
+def worker_exit(server, worker):
+    # Not imported here: a worker that failed to load app.py has nothing to shut down.
+    app = sys.modules.get("app")
+    if app is not None:
+        app.shutdown()
@@ -1,19 +1,66 @@
+import argparse
+import codecs
+import hashlib
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from elasticsearch import Elasticsearch, helpers
+from datetime import datetime, timezone
+from elasticsearch import NotFoundError, helpers
+from normalization import normalize_batch
+from services.embeddings import embedding_text, get_encoder
+from services.es_client import ES_HOST, create_client
+from services.rule_extractor import CONDITION_TERMS_PATH
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-ES_HOST = "http://localhost:9200"
 INDEX_NAME = "clinical_trials_es"
 DATA_PATH = Path(__file__).resolve().parent / "data" / "clinical_trials.json"
+MANIFEST_PATH = Path(__file__).resolve().parent / "data" / "index_manifest.sqlite"
 
-es = Elasticsearch(ES_HOST, request_timeout=60)
+READ_CHUNK_BYTES = 1 << 20
+NORMALIZE_WORKERS = int(os.environ.get("INDEX_WORKERS", str(os.cpu_count() or 1)))
+NORMALIZE_BATCH_SIZE = 500
+BULK_THREADS = 4
+BULK_CHUNK_SIZE = 1000
+BULK_MAX_CHUNK_BYTES = 50 * 1024 * 1024
+PROGRESS_EVERY = 10000
+# Generations kept after a swap: the live one plus one for rollback.
+KEEP_GENERATIONS = 2
+# A new generation must hold at least this share of the live one's docs to be swapped in.
+MIN_DOC_RATIO = 0.9
 
-def get_mapping():
-    return {
+MAPPING_PROFILES = ("full", "lean")
+MAPPING_PROFILE = os.environ.get("MAPPING_PROFILE", "lean")
+INDEX_SHARDS = int(os.environ.get("INDEX_SHARDS", "1"))
+INDEX_REPLICAS = int(os.environ.get("INDEX_REPLICAS", "1"))
+
+# Trials per encoder call when --embeddings is on; the model amortizes well over large batches.
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "256"))
+EMBEDDING_HNSW = {"type": "hnsw", "m": 16, "ef_construction": 100}
+# Distinct conditions written by --export-condition-terms, most frequent first.
+CONDITION_TERMS_SIZE = 5000
+
+# Kept in _source for the /trial detail view but never searched, sorted or aggregated.
+NOT_INDEXED_TEXT = {"type": "text", "index": False}
+# Keyword fields the /search facets aggregate on.
+FACET_FIELDS = [
+    ("phase",), ("overall_status",), ("study_type",),
+    ("facilities", "country"), ("sponsors", "agency_class"), ("interventions", "intervention_type"),
+]
+
+es = create_client(ES_HOST, request_timeout=60, pool_size=max(BULK_THREADS, 10))
+
+def get_mapping(profile=MAPPING_PROFILE, embedding_dims=None):
+    if profile not in MAPPING_PROFILES:
+        raise ValueError(f"Unknown mapping profile: {profile}")
+    mapping = {
         "mappings": {
             "properties": {
             
@@ -55,6 +102,11 @@ def get_mapping():
                 "has_results": {"type": "boolean"},
                 
                 "conditions": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+
+                "suggest": {
+                    "type": "completion",
+                    "contexts": [{"name": "kind", "type": "category"}]
+                },
                 
                 "sponsors": {
                     "type": "nested",
@@ -72,7 +124,8 @@ def get_mapping():
                         "status": {"type": "keyword"},
                         "city": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
                         "state": {"type": "keyword"},
-                        "country": {"type": "keyword"}
+                        "country": {"type": "keyword"},
+                        "location": {"type": "geo_point"}
                     }
                 },
                 
@@ -108,125 +161,516 @@ def get_mapping():
             }
         }
     }
+    if embedding_dims:
+        mapping["mappings"]["properties"]["embedding"] = {
+            "type": "dense_vector",
+            "dims": embedding_dims,
+            "index": True,
+            "similarity": "cosine",
+            "index_options": dict(EMBEDDING_HNSW),
+        }
+    if profile == "lean":
+        return _lean_profile(mapping)
+    return mapping
 
-def generate_actions():
-    if not DATA_PATH.exists():
-        logger.error(f"File not found at {DATA_PATH}")
-        return
+def _lean_profile(mapping):
+    props = mapping["mappings"]["properties"]
 
-    with DATA_PATH.open("r", encoding="utf-8") as f:
-        raw_data = json.load(f)
+    # Every nested object is a hidden Lucene doc; outcomes and groups are display-only,
+    # so keep them as unindexed _source instead of thousands of nested docs per trial.
+    props["design_outcomes"] = {"type": "object", "enabled": False}
+    props["design_groups"] = {"type": "object", "enabled": False}
+    props["intervention_model_description"] = dict(NOT_INDEXED_TEXT)
+    props["interventions"]["properties"]["description"] = dict(NOT_INDEXED_TEXT)
+    props["facilities"]["properties"]["name"] = dict(NOT_INDEXED_TEXT)
 
-    for trial in raw_data:
-        source = trial.copy()
+    for title in ("brief_title", "official_title"):
+        props[title]["index_prefixes"] = {}
 
-        hv_val = str(source.get("healthy_volunteers", "")).upper()
-        if "ACCEPT" in hv_val or hv_val == "YES" or hv_val == "TRUE":
-            source["healthy_volunteers"] = True
-        elif "NA" in hv_val or not hv_val:
-            source.pop("healthy_volunteers", None)
-        else:
-            source["healthy_volunteers"] = False
-        e_val = source.get("enrollment")
-        if e_val is not None:
+    for path in FACET_FIELDS:
+        field = props[path[0]]
+        for part in path[1:]:
+            field = field["properties"][part]
+        field["eager_global_ordinals"] = True
+
+    if "embedding" in props:
+        # The HNSW graph holds the vectors already; a second float-array copy in _source is dead weight.
+        mapping["mappings"]["_source"] = {"excludes": ["embedding"]}
+
+    mapping["settings"] = {
+        "index": {
+            "codec": "best_compression",
+            "number_of_shards": INDEX_SHARDS,
+            "number_of_replicas": INDEX_REPLICAS,
+        }
+    }
+    return mapping
+
+class LoadStats:
+    def __init__(self):
+        self.bytes_read = 0
+        self.docs_read = 0
+        self.started = time.perf_counter()
+
+    def log(self, indexed):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        logger.info(
+            f"Indexed {indexed} docs ({indexed / elapsed:.0f} docs/s), "
+            f"read {self.bytes_read / 1e6:.1f} MB ({self.bytes_read / 1e6 / elapsed:.1f} MB/s)"
+        )
+
+def _read_chunks(path, stats, chunk_size=READ_CHUNK_BYTES):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with path.open("rb") as f:
+        while True:
+            raw = f.read(chunk_size)
+            stats.bytes_read += len(raw)
+            if not raw:
+                yield decoder.decode(b"", final=True)
+                return
+            yield decoder.decode(raw)
+
+def _iter_ndjson(path, stats):
+    pending = ""
+    for chunk in _read_chunks(path, stats):
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+
+def _iter_json_array(path, stats):
+    decoder = json.JSONDecoder()
+    chunks = _read_chunks(path, stats)
+    buf, pos, opened = "", 0, False
+    for chunk in chunks:
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not opened:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} is not a JSON array")
+                opened = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
             try:
-                source["enrollment"] = int(float(str(e_val).replace(',', '')))
-            except (ValueError, TypeError):
-                source["enrollment"] = None
-
-        for age_field in ["minimum_age", "maximum_age"]:
-            age_str = source.get(age_field, "")
-            if age_str and age_str != "NA" and str(age_str).upper() not in ["UNKNOWN", "NULL", ""]:
-                try:
-                    age_num = int(''.join(filter(str.isdigit, str(age_str))))
-                    source[age_field] = age_num
-                except (ValueError, TypeError):
-                    source.pop(age_field, None)
-            else:
-                source.pop(age_field, None)
-
-        for num_field in ["number_of_arms", "number_of_groups"]:
-            val = source.get(num_field)
-            if val is not None and val not in ["NA", "None", "null", ""]:
-                try:
-                    source[num_field] = int(str(val))
-                except (ValueError, TypeError):
-                    source.pop(num_field, None)
-            else:
-                source.pop(num_field, None)
-
-        for bool_field in ["subject_masked", "caregiver_masked", "investigator_masked", 
-                          "outcomes_assessor_masked", "has_results"]:
-            val = source.get(bool_field)
-            if val is not None:
-                if isinstance(val, bool):
-                    source[bool_field] = val
-                elif isinstance(val, (int, float)):
-                    source[bool_field] = bool(val)
-                elif isinstance(val, str):
-                    source[bool_field] = val.lower() in ["true", "yes", "1"]
-                else:
-                    source.pop(bool_field, None)
-            else:
-                source.pop(bool_field, None)
-
-        for d_field in ["start_date", "completion_date", "primary_completion_date"]:
-            val = source.get(d_field)
-            if not val or str(val).upper() in ["NA", "NULL", "UNKNOWN", ""]:
-                source.pop(d_field, None)
-
-        if isinstance(source.get("conditions"), list):
-            source["conditions"] = [
-                c.get("name", str(c)) if isinstance(c, dict) else str(c) 
-                for c in source["conditions"]
-            ]
-            
-        fields_to_keep = {
-            "nct_id", "acronym", "source",
-            "brief_title", "official_title",
-            "overall_status", "phase",
-            "study_type", "primary_purpose", "allocation", "intervention_model", "intervention_model_description",
-            "masking", "subject_masked", "caregiver_masked", "investigator_masked", "outcomes_assessor_masked",
-            "enrollment", "minimum_age", "maximum_age", "gender", "healthy_volunteers",
-            "number_of_arms", "number_of_groups",
-            "start_date", "completion_date", "primary_completion_date",
-            "has_results",
-            "conditions", "sponsors", "facilities", "interventions", "design_outcomes", "design_groups"
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Object straddles the chunk boundary; read more.
+                break
+            yield obj
+            pos = end
+    if buf[pos:].strip():
+        raise ValueError(f"Unexpected end of JSON array in {path}")
+
+def iter_trials(path=DATA_PATH, stats=None):
+    stats = stats or LoadStats()
+    path = Path(path)
+    reader = _iter_ndjson if path.suffix in (".ndjson", ".jsonl") else _iter_json_array
+    for trial in reader(path, stats):
+        stats.docs_read += 1
+        yield trial
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def normalized_trials(trials, workers=NORMALIZE_WORKERS, batch_size=NORMALIZE_BATCH_SIZE):
+    if workers <= 1:
+        for batch in _batches(trials, batch_size):
+            yield from normalize_batch(batch)
+        return
+    # Bounded number of batches in flight keeps memory flat however large the dump is.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in _batches(trials, batch_size):
+            pending.append(pool.submit(normalize_batch, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def content_hash(source):
+    payload = json.dumps(source, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class IndexManifest:
+    """
+    nct_id -> content hash of the normalized _source held by the live generation.
+
+    Writes stay in one open transaction until commit(), so a failed load can
+    rollback() and leave the manifest matching what is actually being served.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # parallel_bulk pulls actions on a worker thread, so guard the shared connection.
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("CREATE TABLE IF NOT EXISTS manifest (nct_id TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+        self.db.execute("CREATE TEMP TABLE seen (nct_id TEXT PRIMARY KEY)")
+        self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+
+    def get(self, nct_id):
+        with self.lock:
+            row = self.db.execute("SELECT hash FROM manifest WHERE nct_id = ?", (nct_id,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, nct_id, digest):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO manifest (nct_id, hash) VALUES (?, ?)", (nct_id, digest))
+
+    def delete(self, nct_id):
+        with self.lock:
+            self.db.execute("DELETE FROM manifest WHERE nct_id = ?", (nct_id,))
+
+    def mark_seen(self, nct_id):
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO seen (nct_id) VALUES (?)", (nct_id,))
+
+    def unseen(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT nct_id FROM manifest WHERE nct_id NOT IN (SELECT nct_id FROM seen)"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def reset(self):
+        with self.lock:
+            self.db.execute("DELETE FROM manifest")
+
+    def commit(self):
+        with self.lock:
+            self.db.execute("DELETE FROM seen")
+            self.db.commit()
+
+    def rollback(self):
+        with self.lock:
+            self.db.rollback()
+            self.db.execute("DELETE FROM seen")
+
+    def close(self):
+        self.db.close()
+
+def generate_actions(path=DATA_PATH, stats=None, workers=NORMALIZE_WORKERS, batch_size=NORMALIZE_BATCH_SIZE,
+                     index=INDEX_NAME, manifest=None):
+    path = Path(path)
+    if not path.exists():
+        logger.error(f"File not found at {path}")
+        return
+
+    for source in normalized_trials(iter_trials(path, stats), workers, batch_size):
+        if manifest is not None:
+            manifest.set(source.get("nct_id"), content_hash(source))
+        yield {
+            "_index": index,
+            "_id": source.get("nct_id"),
+            "_source": source,
         }
-        
-        source = {k: v for k, v in source.items() if k in fields_to_keep}
 
+def generate_delta_actions(manifest, counts, path=DATA_PATH, stats=None, workers=NORMALIZE_WORKERS,
+                           batch_size=NORMALIZE_BATCH_SIZE, force=False):
+    path = Path(path)
+    if not path.exists():
+        logger.error(f"File not found at {path}")
+        return
+
+    for source in normalized_trials(iter_trials(path, stats), workers, batch_size):
+        nct_id = source.get("nct_id")
+        digest = content_hash(source)
+        previous = manifest.get(nct_id)
+        manifest.mark_seen(nct_id)
+        if previous == digest:
+            counts["unchanged"] += 1
+            continue
+        counts["new" if previous is None else "changed"] += 1
+        manifest.set(nct_id, digest)
         yield {
             "_index": INDEX_NAME,
-            "_id": trial.get("nct_id"),
+            "_id": nct_id,
             "_source": source,
         }
 
-def index_data():
-    if not es.ping():
-        logger.error("ES Connection Failed. Is Elasticsearch running?")
+    removed = manifest.unseen()
+    known = counts["unchanged"] + counts["changed"] + len(removed)
+    if known and len(removed) > known * (1 - MIN_DOC_RATIO) and not force:
+        logger.error(
+            f"{len(removed)} of {known} known trials are missing from {path}; not deleting them. "
+            "Re-run with --force if the dump really shrank."
+        )
         return
+    for nct_id in removed:
+        counts["removed"] += 1
+        manifest.delete(nct_id)
+        yield {"_op_type": "delete", "_index": INDEX_NAME, "_id": nct_id}
 
-    if es.indices.exists(index=INDEX_NAME):
-        logger.info(f"Deleting existing index: {INDEX_NAME}")
-        es.indices.delete(index=INDEX_NAME)
-
-    logger.info(f"Creating index: {INDEX_NAME}")
-    es.indices.create(index=INDEX_NAME, body=get_mapping())
+def embed_actions(actions, encoder, batch_size=EMBED_BATCH_SIZE):
+    """
+    Adds an `embedding` vector to each index action, encoding in batches. Runs after
+    the manifest hash is taken, so float noise between encoder runs never shows up
+    as a changed trial.
+    """
+    for batch in _batches(actions, batch_size):
+        targets = [a for a in batch if a.get("_op_type", "index") == "index"]
+        texts = [embedding_text(a["_source"]) for a in targets]
+        # Empty text would encode to a zero vector, which cosine similarity rejects.
+        targets = [(a, text) for a, text in zip(targets, texts) if text]
+        if targets:
+            vectors = encoder.encode([text for _, text in targets])
+            for (action, _), vector in zip(targets, vectors):
+                action["_source"]["embedding"] = vector
+        yield from batch
 
-    logger.info("Starting bulk indexing...")
-    success, errors = helpers.bulk(es, generate_actions(), raise_on_error=False)
+def run_bulk(actions, stats, thread_count=BULK_THREADS, chunk_size=BULK_CHUNK_SIZE,
+             max_chunk_bytes=BULK_MAX_CHUNK_BYTES, manifest=None):
+    success, errors = 0, []
+    for ok, item in helpers.parallel_bulk(
+        es,
+        actions,
+        thread_count=thread_count,
+        chunk_size=chunk_size,
+        max_chunk_bytes=max_chunk_bytes,
+        raise_on_error=False,
+    ):
+        op, result = next(iter(item.items()))
+        if op == "delete" and result.get("status") == 404:
+            ok = True
+        if ok:
+            success += 1
+        else:
+            errors.append(item)
+            if manifest is not None and op != "delete":
+                # Forget the hash so the next delta run re-sends this trial.
+                manifest.delete(result.get("_id"))
+        if (success + len(errors)) % PROGRESS_EVERY == 0:
+            stats.log(success + len(errors))
 
     if errors:
         logger.error(f"Failed to index {len(errors)} docs.")
         for i, error in enumerate(errors[:5]):
-            error_details = error.get('index', {}).get('error', {})
-            reason = error_details.get('reason')
-            doc_id = error.get('index', {}).get('_id')
-            logger.error(f"Doc {doc_id} failed: {reason}")
-    
+            op, result = next(iter(error.items()))
+            reason = result.get('error', {}).get('reason')
+            logger.error(f"Doc {result.get('_id')} {op} failed: {reason}")
+
+    stats.log(success + len(errors))
+    return success, errors
+
+def _bulk_load_settings(index):
+    current = es.indices.get_settings(index=index)[index]["settings"]["index"]
+    previous = {
+        "refresh_interval": current.get("refresh_interval", "1s"),
+        "number_of_replicas": current.get("number_of_replicas", "1"),
+    }
+    es.indices.put_settings(index=index, body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+    return previous
+
+def new_generation_name(alias=INDEX_NAME):
+    return f"{alias}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
+
+def live_generations(alias=INDEX_NAME):
+    try:
+        return sorted(es.indices.get_alias(name=alias).keys())
+    except NotFoundError:
+        return []
+
+def list_generations(alias=INDEX_NAME):
+    return sorted(es.indices.get(index=f"{alias}_*").keys())
+
+def check_generation(generation, indexed, force=False, alias=INDEX_NAME):
+    es.indices.refresh(index=generation)
+    count = es.count(index=generation)["count"]
+    if count == 0 or count < indexed:
+        logger.error(f"{generation} holds {count} docs but {indexed} were indexed.")
+        return False
+
+    live = live_generations(alias)
+    if not live and es.indices.exists(index=alias):
+        live = [alias]
+    live_count = sum(es.count(index=name)["count"] for name in live)
+    if live_count and count < live_count * MIN_DOC_RATIO and not force:
+        logger.error(
+            f"{generation} holds {count} docs, under {MIN_DOC_RATIO:.0%} of the live {live_count}. "
+            "Re-run with --force to swap anyway."
+        )
+        return False
+    return True
+
+def swap_alias(generation, alias=INDEX_NAME):
+    actions = [{"remove": {"index": name, "alias": alias}} for name in live_generations(alias)]
+    if not actions and es.indices.exists(index=alias):
+        # Trees indexed before aliases were introduced hold a concrete index under the alias
+        # name; it is dropped in the same atomic request that creates the alias.
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": generation, "alias": alias}})
+    es.indices.update_aliases(body={"actions": actions})
+    logger.info(f"Alias {alias} -> {generation}")
+
+def collect_garbage(keep=KEEP_GENERATIONS, alias=INDEX_NAME):
+    live = set(live_generations(alias))
+    for name in list_generations(alias)[:-keep]:
+        if name not in live:
+            logger.info(f"Deleting old generation: {name}")
+            es.indices.delete(index=name)
+
+def index_data(path=DATA_PATH, workers=NORMALIZE_WORKERS, batch_size=NORMALIZE_BATCH_SIZE,
+               thread_count=BULK_THREADS, chunk_size=BULK_CHUNK_SIZE, max_chunk_bytes=BULK_MAX_CHUNK_BYTES,
+               force=False, mapping_profile=MAPPING_PROFILE, embeddings=False, alias=INDEX_NAME,
+               manifest_path=MANIFEST_PATH):
+    """
+    Full load into a new generation behind `alias`. `alias` and `manifest_path` default to
+    the served index; benchmarks pass scratch values so they never touch either.
+    """
+    if not es.ping():
+        logger.error("ES Connection Failed. Is Elasticsearch running?")
+        return
+
+    encoder = get_encoder() if embeddings else None
+    generation = new_generation_name(alias)
+    logger.info(f"Creating index: {generation} ({mapping_profile} mapping)")
+    es.indices.create(index=generation, body=get_mapping(mapping_profile, encoder.dims if encoder else None))
+    # No refreshes or replica copies while loading; both are restored below.
+    previous_settings = _bulk_load_settings(generation)
+
+    logger.info(f"Starting parallel bulk indexing ({workers} normalize workers, {thread_count} bulk threads)...")
+    stats = LoadStats()
+    manifest = IndexManifest(manifest_path)
+    manifest.reset()
+    try:
+        actions = generate_actions(path, stats, workers, batch_size, index=generation, manifest=manifest)
+        if encoder is not None:
+            logger.info(f"Computing {encoder.name} embeddings ({encoder.dims} dims)")
+            actions = embed_actions(actions, encoder)
+        success, errors = run_bulk(actions, stats, thread_count, chunk_size, max_chunk_bytes, manifest)
+    except BaseException:
+        # Interrupted loads included: a leftover generation would sort last and make
+        # collect_garbage drop the previous live one, i.e. the rollback copy.
+        logger.error(f"Load failed; keeping the live index and deleting {generation}.")
+        manifest.rollback()
+        manifest.close()
+        es.indices.delete(index=generation)
+        raise
+    es.indices.put_settings(index=generation, body={"index": previous_settings})
+
     logger.info(f"Successfully indexed {success} trials.")
     logger.info(f"Total results (success + errors): {success + len(errors)}")
 
+    if not check_generation(generation, success, force, alias):
+        logger.error(f"Sanity check failed; keeping the live index and deleting {generation}.")
+        es.indices.delete(index=generation)
+        manifest.rollback()
+        manifest.close()
+        return
+
+    swap_alias(generation, alias)
+    manifest.commit()
+    manifest.close()
+    collect_garbage(alias=alias)
+
+def index_delta(path=DATA_PATH, workers=NORMALIZE_WORKERS, batch_size=NORMALIZE_BATCH_SIZE,
+                thread_count=BULK_THREADS, chunk_size=BULK_CHUNK_SIZE, max_chunk_bytes=BULK_MAX_CHUNK_BYTES,
+                force=False, mapping_profile=MAPPING_PROFILE, embeddings=False):
+    if not es.ping():
+        logger.error("ES Connection Failed. Is Elasticsearch running?")
+        return
+
+    manifest = IndexManifest()
+    if not live_generations() or not len(manifest):
+        manifest.close()
+        logger.info("No live generation or manifest yet; running a full load instead.")
+        return index_data(path, workers, batch_size, thread_count, chunk_size, max_chunk_bytes, force, mapping_profile,
+                          embeddings)
+
+    encoder = None
+    if embeddings:
+        live_mapping = next(iter(es.indices.get_mapping(index=INDEX_NAME).values()))["mappings"]
+        if "embedding" in live_mapping.get("properties", {}):
+            encoder = get_encoder()
+        else:
+            logger.warning("Live generation has no embedding field; run a full load to add one. Skipping embeddings.")
+
+    # Fields added to the mapping since the live generation was built; existing fields can't change in place.
+    es.indices.put_mapping(index=INDEX_NAME, body={"properties": {"facilities": {
+        "type": "nested", "properties": {"location": {"type": "geo_point"}}
+    }}})
+
+    logger.info(f"Starting delta indexing against {INDEX_NAME} ({len(manifest)} known trials)...")
+    stats = LoadStats()
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    try:
+        actions = generate_delta_actions(manifest, counts, path, stats, workers, batch_size, force)
+        if encoder is not None:
+            actions = embed_actions(actions, encoder)
+        success, errors = run_bulk(actions, stats, thread_count, chunk_size, max_chunk_bytes, manifest)
+        es.indices.refresh(index=INDEX_NAME)
+        # Bumping data_version tells SearchEngine result caches the live data changed.
+        es.indices.put_mapping(index=INDEX_NAME, body={"_meta": {"data_version": datetime.now(timezone.utc).isoformat()}})
+        manifest.commit()
+    except Exception:
+        manifest.rollback()
+        raise
+    finally:
+        manifest.close()
+
+    logger.info(
+        f"Delta applied: {counts['new']} new, {counts['changed']} changed, {counts['removed']} removed, "
+        f"{counts['unchanged']} unchanged ({success} ok, {len(errors)} failed)."
+    )
+
+def export_condition_terms(path=CONDITION_TERMS_PATH, size=CONDITION_TERMS_SIZE):
+    """Writes the live index's most frequent conditions as the rule extractor's condition vocabulary."""
+    response = es.search(index=INDEX_NAME, size=0, aggs={
+        "conditions": {"terms": {"field": "conditions.keyword", "size": size}}
+    })
+    terms = dict.fromkeys(
+        " ".join(bucket["key"].lower().split()) for bucket in response["aggregations"]["conditions"]["buckets"]
+    )
+    terms.pop("", None)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# Condition vocabulary for the rule extractor, exported from {INDEX_NAME}.\n")
+        f.writelines(f"{term}\n" for term in terms)
+    logger.info(f"Wrote {len(terms)} condition terms to {path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load ClinicalTrials.gov data into Elasticsearch")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="JSON array or NDJSON (.ndjson/.jsonl) dump")
+    parser.add_argument("--workers", type=int, default=NORMALIZE_WORKERS, help="Normalization processes (1 = inline)")
+    parser.add_argument("--batch-size", type=int, default=NORMALIZE_BATCH_SIZE, help="Trials per normalization batch")
+    parser.add_argument("--threads", type=int, default=BULK_THREADS, help="parallel_bulk threads")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Docs per bulk request")
+    parser.add_argument("--max-chunk-bytes", type=int, default=BULK_MAX_CHUNK_BYTES, help="Bytes per bulk request")
+    parser.add_argument("--force", action="store_true", help="Swap the alias even if the doc count dropped sharply")
+    parser.add_argument("--delta", action="store_true", help="Only send new, changed and removed trials to the live index")
+    parser.add_argument("--mapping-profile", choices=MAPPING_PROFILES, default=MAPPING_PROFILE,
+                        help="'lean' skips indexing display-only fields and compresses _source; 'full' indexes everything")
+    parser.add_argument("--embeddings", action="store_true",
+                        help="Store an HNSW-indexed embedding per trial (encoder from EMBEDDING_ENCODER)")
+    parser.add_argument("--export-condition-terms", action="store_true",
+                        help=f"Only write the live index's conditions to {CONDITION_TERMS_PATH.name} for the rule extractor")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    index_data()
\ No newline at end of file
+    args = parse_args()
+    if args.export_condition_terms:
+        export_condition_terms()
+    else:
+        load = index_delta if args.delta else index_data
+        load(args.data, args.workers, args.batch_size, args.threads, args.chunk_size, args.max_chunk_bytes, args.force,
+             args.mapping_profile, args.embeddings)
@@ -0,0 +1,200 @@
+import re
+from services.geo import locate
+
+FIELDS_TO_KEEP = frozenset({
+    "nct_id", "acronym", "source",
+    "brief_title", "official_title",
+    "overall_status", "phase",
+    "study_type", "primary_purpose", "allocation", "intervention_model", "intervention_model_description",
+    "masking", "subject_masked", "caregiver_masked", "investigator_masked", "outcomes_assessor_masked",
+    "enrollment", "minimum_age", "maximum_age", "gender", "healthy_volunteers",
+    "number_of_arms", "number_of_groups",
+    "start_date", "completion_date", "primary_completion_date",
+    "has_results",
+    "conditions", "sponsors", "facilities", "interventions", "design_outcomes", "design_groups"
+})
+
+# Returned by a cleaner when the field should be dropped from _source.
+DROP = object()
+
+AGE_FIELDS = ("minimum_age", "maximum_age")
+NUM_FIELDS = ("number_of_arms", "number_of_groups")
+BOOL_FIELDS = ("subject_masked", "caregiver_masked", "investigator_masked", "outcomes_assessor_masked", "has_results")
+DATE_FIELDS = ("start_date", "completion_date", "primary_completion_date")
+
+_AGE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(year|yr|month|mo|week|wk|day|hour|minute)?", re.IGNORECASE)
+# Ages are indexed as whole years.
+_AGE_UNIT_YEARS = {
+    "year": 1, "yr": 1,
+    "month": 1 / 12, "mo": 1 / 12,
+    "week": 7 / 365.25, "wk": 7 / 365.25,
+    "day": 1 / 365.25,
+    "hour": 1 / 8766, "minute": 1 / 525960,
+}
+
+
+def parse_age_years(value):
+    match = _AGE_RE.search(str(value))
+    if not match:
+        return None
+    unit = (match.group(2) or "year").lower()
+    return int(float(match.group(1)) * _AGE_UNIT_YEARS[unit])
+
+
+def clean_healthy_volunteers(val):
+    hv_val = str(val).upper()
+    if "ACCEPT" in hv_val or hv_val == "YES" or hv_val == "TRUE":
+        return True
+    elif "NA" in hv_val or not hv_val:
+        return DROP
+    return False
+
+
+def clean_enrollment(val):
+    if val is None:
+        return None
+    try:
+        return int(float(str(val).replace(',', '')))
+    except (ValueError, TypeError):
+        return None
+
+
+def clean_age(val):
+    if val and val != "NA" and str(val).upper() not in ["UNKNOWN", "NULL", ""]:
+        age = parse_age_years(val)
+        return DROP if age is None else age
+    return DROP
+
+
+def clean_count(val):
+    if val is not None and val not in ["NA", "None", "null", ""]:
+        try:
+            return int(str(val))
+        except (ValueError, TypeError):
+            return DROP
+    return DROP
+
+
+def clean_flag(val):
+    if isinstance(val, bool):
+        return val
+    elif isinstance(val, (int, float)):
+        return bool(val)
+    elif isinstance(val, str):
+        return val.lower() in ["true", "yes", "1"]
+    return DROP
+
+
+def clean_date(val):
+    if not val or str(val).upper() in ["NA", "NULL", "UNKNOWN", ""]:
+        return DROP
+    return val
+
+
+def clean_conditions(val):
+    if isinstance(val, list):
+        return [c.get("name", str(c)) if isinstance(c, dict) else str(c) for c in val]
+    return val
+
+
+def clean_facilities(val):
+    if not isinstance(val, list):
+        return val
+    cleaned = []
+    for facility in val:
+        if isinstance(facility, dict) and facility.get("city") and "location" not in facility:
+            location = locate(facility["city"], facility.get("state"), facility.get("country"))
+            if location is not None:
+                facility = dict(facility, location=location)
+        cleaned.append(facility)
+    return cleaned
+
+
+COLUMN_CLEANERS = (
+    [("healthy_volunteers", clean_healthy_volunteers), ("enrollment", clean_enrollment)]
+    + [(field, clean_age) for field in AGE_FIELDS]
+    + [(field, clean_count) for field in NUM_FIELDS]
+    + [(field, clean_flag) for field in BOOL_FIELDS]
+    + [(field, clean_date) for field in DATE_FIELDS]
+)
+
+# Nested/list-valued columns: too varied to memoize, cleaned per row.
+ROW_CLEANERS = (("conditions", clean_conditions), ("facilities", clean_facilities))
+
+
+SUGGEST_SOURCES = (
+    ("condition", lambda source: source.get("conditions")),
+    ("sponsor", lambda source: [s.get("name") for s in source.get("sponsors") or [] if isinstance(s, dict)]),
+    ("city", lambda source: [f.get("city") for f in source.get("facilities") or [] if isinstance(f, dict)]),
+    ("intervention", lambda source: [i.get("name") for i in source.get("interventions") or [] if isinstance(i, dict)]),
+)
+
+# The completion field caps input length; longer strings aren't useful suggestions anyway.
+MAX_SUGGEST_LENGTH = 100
+
+
+def build_suggestions(source):
+    suggestions = []
+    for kind, values in SUGGEST_SOURCES:
+        inputs = values(source) or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        inputs = sorted({str(v).strip() for v in inputs if v and len(str(v).strip()) <= MAX_SUGGEST_LENGTH})
+        if inputs:
+            suggestions.append({"input": inputs, "contexts": {"kind": [kind]}})
+    return suggestions
+
+
+def _add_suggestions(source):
+    suggestions = build_suggestions(source)
+    if suggestions:
+        source["suggest"] = suggestions
+    return source
+
+
+def normalize_trial(trial):
+    source = {k: v for k, v in trial.items() if k in FIELDS_TO_KEEP}
+    for field, cleaner in COLUMN_CLEANERS + list(ROW_CLEANERS):
+        if field not in source:
+            continue
+        cleaned = cleaner(source[field])
+        if cleaned is DROP:
+            del source[field]
+        else:
+            source[field] = cleaned
+    return _add_suggestions(source)
+
+
+def normalize_batch(trials):
+    """
+    Columnar equivalent of [normalize_trial(t) for t in trials].
+
+    Each scalar column is cleaned in one pass over the batch with a per-column memo
+    keyed on (type, value). Registry dumps repeat a handful of distinct values
+    ("18 Years", "Accepts Healthy Volunteers", "NA") across every row, so almost every
+    cell becomes a dict lookup instead of a parse.
+    """
+    sources = [{k: v for k, v in trial.items() if k in FIELDS_TO_KEEP} for trial in trials]
+    for field, cleaner in COLUMN_CLEANERS:
+        memo = {}
+        for source in sources:
+            val = source.get(field, DROP)
+            if val is DROP:
+                continue
+            try:
+                key = (type(val), val)
+                cleaned = memo.get(key, memo)
+                if cleaned is memo:
+                    cleaned = memo[key] = cleaner(val)
+            except TypeError:
+                # Unhashable cell (list/dict); clean it directly.
+                cleaned = cleaner(val)
+            if cleaned is DROP:
+                del source[field]
+            else:
+                source[field] = cleaned
+    for field, cleaner in ROW_CLEANERS:
+        for source in sources:
+            if field in source:
+                source[field] = cleaner(source[field])
+    return [_add_suggestions(source) for source in sources]
@@ -1,25 +1,31 @@
+import asyncio
 import json
+import os
 import boto3
 import re
 import logging
+from services.entity_cache import EntityCache
+from services.llm_batcher import ExtractionCoalescer
+from services.metrics import stage
+from services.rule_extractor import RuleExtractor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class QueryBrain:
-    def __init__(self):
-        try:
-            self.bedrock = boto3.client(service_name='bedrock-runtime', region_name='us-east-1')
-            self.bedrock_available = True
-        except Exception as e:
-            logger.warning(f"Bedrock client initialization failed: {e}. Falling back to regex extraction.")
-            self.bedrock_available = False
+ENTITY_CACHE_SIZE = int(os.environ.get("ENTITY_CACHE_SIZE", "2048"))
+ENTITY_CACHE_TTL = int(os.environ.get("ENTITY_CACHE_TTL", str(24 * 3600)))
+ENTITY_CACHE_DB = os.environ.get("ENTITY_CACHE_DB")
+RULE_CONFIDENCE_THRESHOLD = float(os.environ.get("RULE_CONFIDENCE_THRESHOLD", "1.0"))
+# Queries reaching the LLM within this window share one prompt; 0 sends each on its own.
+LLM_BATCH_WINDOW_MS = float(os.environ.get("LLM_BATCH_WINDOW_MS", "5"))
+LLM_BATCH_MAX = int(os.environ.get("LLM_BATCH_MAX", "16"))
+# Bedrock calls in flight at once; keep at or under the account's invoke_model rate limit.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_TOKENS_PER_QUERY = 500
+# Longest a request waits for its (possibly queued) batch before falling back to rule entities.
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
 
-    def extract_entities(self, user_query):
-        prompt = f"""
-        Extract clinical trial search parameters from this query: "{user_query}"
-        Return ONLY a JSON object with no additional text.
-        
+EXTRACTION_RULES = """
         IMPORTANT RULES:
         
         Status Mapping (use exact uppercase):
@@ -75,6 +81,12 @@ class QueryBrain:
         - "accept healthy volunteers" or "healthy subjects" → true
         - "patient only" or "no healthy volunteers" → false
         
+        Distance:
+        - "within 50 km of Boston" → near: "Boston", distance_km: 50
+        - "within 20 miles of Houston" → near: "Houston", distance_km: 32
+        - "near Seattle" → near: "Seattle" (no distance_km)
+        Use city/state/country instead when the query says "in".
+        
         FIELDS TO EXTRACT (only if mentioned in query):
         - overall_status: RECRUITING, NOT_YET_RECRUITING, ACTIVE_NOT_RECRUITING, COMPLETED, SUSPENDED, WITHDRAWN
         - phase: PHASE1, PHASE2, PHASE3, PHASE4
@@ -91,42 +103,124 @@ class QueryBrain:
         - max_age: Maximum age as number
         - healthy_volunteers: true or false
         - enrollment_size: small, medium, or large
+        - near: Place the trial sites should be close to (e.g., "Boston" or "Paris, France")
+        - distance_km: Radius around "near" in kilometers, as a number
         
         EXAMPLES:
         
         Input: "open phase 2 drug trials for asthma in Miami"
-        Output: {{"overall_status": "RECRUITING", "phase": "PHASE2", "intervention_type": "DRUG", "condition": "Asthma", "city": "Miami"}}
+        Output: {"overall_status": "RECRUITING", "phase": "PHASE2", "intervention_type": "DRUG", "condition": "Asthma", "city": "Miami"}
         
         Input: "double-blind phase 3 treatment studies for cancer in California, aged 18-65"
-        Output: {{"masking": "DOUBLE", "phase": "PHASE3", "primary_purpose": "TREATMENT", "condition": "Cancer", "state": "California", "min_age": 18, "max_age": 65}}
+        Output: {"masking": "DOUBLE", "phase": "PHASE3", "primary_purpose": "TREATMENT", "condition": "Cancer", "state": "California", "min_age": 18, "max_age": 65}
         
         Input: "completed observational diabetes studies in New York"
-        Output: {{"overall_status": "COMPLETED", "study_type": "OBSERVATIONAL", "condition": "Diabetes", "city": "New York"}}
+        Output: {"overall_status": "COMPLETED", "study_type": "OBSERVATIONAL", "condition": "Diabetes", "city": "New York"}
         
         Input: "phase 1 device studies for heart disease accepting healthy volunteers"
-        Output: {{"phase": "PHASE1", "intervention_type": "DEVICE", "condition": "Heart disease", "healthy_volunteers": true}}
+        Output: {"phase": "PHASE1", "intervention_type": "DEVICE", "condition": "Heart disease", "healthy_volunteers": true}
+        
+        Input: "recruiting melanoma trials within 100 miles of Chicago"
+        Output: {"overall_status": "RECRUITING", "condition": "Melanoma", "near": "Chicago", "distance_km": 161}
         
         Input: "behavioral prevention trials with 100-150 participants"
-        Output: {{"intervention_type": "BEHAVIORAL", "primary_purpose": "PREVENTION", "enrollment_size": "medium"}}
+        Output: {"intervention_type": "BEHAVIORAL", "primary_purpose": "PREVENTION", "enrollment_size": "medium"}
+"""
+
+def extraction_prompt(queries):
+    if len(queries) == 1:
+        return f"""
+        Extract clinical trial search parameters from this query: "{queries[0]}"
+        Return ONLY a JSON object with no additional text.
+        """ + EXTRACTION_RULES
+    numbered = "\n".join(f"        {i}. {json.dumps(query)}" for i, query in enumerate(queries, 1))
+    # The static rule block is sent once for the whole batch instead of once per query.
+    return f"""
+        Extract clinical trial search parameters from each of these {len(queries)} numbered queries:
+{numbered}
+        Return ONLY a JSON array with exactly one object per query, in the same order, with no additional text.
+        Each object follows the rules and output format below.
+        """ + EXTRACTION_RULES
+
+class QueryBrain:
+    def __init__(self, cache=None, bedrock=None):
+        self.cache = cache or EntityCache(
+            max_size=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL, db_path=ENTITY_CACHE_DB
+        )
+        self.rules = RuleExtractor()
+        # Any object with boto3's invoke_model(body=, modelId=) interface, e.g. the benchmark stub.
+        self.bedrock = bedrock
+        self.bedrock_available = bedrock is not None
+        if bedrock is None:
+            try:
+                self.bedrock = boto3.client(service_name='bedrock-runtime', region_name='us-east-1')
+                self.bedrock_available = True
+            except Exception as e:
+                logger.warning(f"Bedrock client initialization failed: {e}. Falling back to regex extraction.")
+        self.coalescer = None
+        if LLM_BATCH_WINDOW_MS > 0:
+            self.coalescer = ExtractionCoalescer(
+                self._invoke_batch, LLM_BATCH_WINDOW_MS, LLM_BATCH_MAX, LLM_MAX_CONCURRENCY
+            )
+
+    def close(self):
+        """Flushes queued LLM extractions and waits for the in-flight ones."""
+        if self.coalescer is not None:
+            self.coalescer.close()
+
+    def extract_entities(self, user_query):
+        entities, rule_entities = self.local_entities(user_query)
+        if entities is not None:
+            return entities
+        return self.extract_with_llm(user_query, rule_entities)
+
+    async def extract_entities_async(self, user_query):
+        entities, rule_entities = self.local_entities(user_query)
+        if entities is not None:
+            return entities
+        return await self.extract_with_llm_async(user_query, rule_entities)
+
+    async def extract_with_llm_async(self, user_query, rule_entities):
+        # boto3 has no native asyncio API; the blocking invoke_model runs on the default executor.
+        return await asyncio.to_thread(self.extract_with_llm, user_query, rule_entities)
+
+    def local_entities(self, user_query):
         """
-        
+        Returns (entities, rule_entities). entities comes from the rule fast path or the
+        entity cache and is None when only the LLM can answer; rule_entities is the
+        fallback to use if it fails.
+        """
+        rule_entities, confidence = self.rules.extract(user_query)
+        if rule_entities and confidence >= RULE_CONFIDENCE_THRESHOLD:
+            logger.debug(f"Rule fast path ({confidence}): {rule_entities}")
+            return rule_entities, rule_entities
+
+        return self.cache.get(user_query), rule_entities
+
+    def extract_with_llm(self, user_query, rule_entities):
+        try:
+            if self.coalescer is not None:
+                entities = self.coalescer.submit(user_query).result(timeout=LLM_TIMEOUT_SECONDS)
+            else:
+                entities = self._invoke_batch([user_query])[0]
+            self.cache.put(user_query, entities)
+            return entities
+
+        except Exception as e:
+            logger.warning(f"LLM extraction failed, falling back to rule entities: {e}")
+            fallback = dict(rule_entities)
+            fallback.setdefault("condition", user_query)
+            return fallback
+
+    def _invoke_batch(self, queries):
+        """One Bedrock call for all queries; returns their entity dicts in order."""
         body = json.dumps({
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 500,
-            "messages": [{"role": "user", "content": prompt}]
+            "max_tokens": min(LLM_TOKENS_PER_QUERY * len(queries), 4096),
+            "messages": [{"role": "user", "content": extraction_prompt(queries)}]
         })
-        
-        try:
+        with stage("llm"):
             response = self.bedrock.invoke_model(body=body, modelId='anthropic.claude-3-haiku-20240307-v1:0')
-            response_body = json.loads(response.get('body').read())
-            
-            entities = json.loads(response_body['content'][0]['text'])
-            
-            if "state" in entities and "city" not in entities:
-                pass
-            
-            return entities
-            
-        except Exception as e:
-            print(f"LLM Error: {e}")
-            return {"condition": user_query}
\ No newline at end of file
+        response_body = json.loads(response.get('body').read())
+        parsed = json.loads(response_body['content'][0]['text'])
+        return [parsed] if len(queries) == 1 else parsed
\ No newline at end of file
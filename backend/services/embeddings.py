@@ -0,0 +1,75 @@
+import math
+import os
+import re
+import zlib
+
+EMBEDDING_ENCODER = os.environ.get("EMBEDDING_ENCODER", "hashing")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEncoder:
+    """
+    Dependency-free stand-in encoder: signed feature hashing of words and character
+    trigrams. Deterministic across processes, so tests and offline benchmarks can
+    index and query with it, but it knows nothing about synonyms.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dims=256):
+        self.dims = dims
+
+    def _features(self, text):
+        for word in _TOKEN_RE.findall(text.lower()):
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dims
+            for feature, weight in self._features(text or ""):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vector[h % self.dims] += weight if h & 0x80000000 else -weight
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+
+class SentenceTransformerEncoder:
+    """Small CPU sentence-embedding model (all-MiniLM-L6-v2 by default, 384 dims)."""
+
+    name = "minilm"
+
+    def __init__(self, model_name=EMBEDDING_MODEL, batch_size=64):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dims = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        vectors = self.model.encode(
+            [text or "" for text in texts], batch_size=self.batch_size, normalize_embeddings=True
+        )
+        return [vector.tolist() for vector in vectors]
+
+
+ENCODERS = {"hashing": HashingEncoder, "minilm": SentenceTransformerEncoder}
+
+
+def get_encoder(name=EMBEDDING_ENCODER):
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown embedding encoder: {name}")
+    return ENCODERS[name]()
+
+
+def embedding_text(source):
+    conditions = source.get("conditions") or []
+    if isinstance(conditions, str):
+        conditions = [conditions]
+    parts = [source.get("brief_title"), source.get("official_title"), "; ".join(str(c) for c in conditions)]
+    return ". ".join(part for part in parts if part)
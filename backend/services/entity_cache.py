@@ -0,0 +1,194 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SIMPLE_QUERY_MAX_TOKENS = 4
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(user_query):
+    text = _PUNCT_RE.sub(" ", str(user_query).lower())
+    tokens = _SPACE_RE.split(text.strip())
+    tokens = [t for t in tokens if t]
+    # Short keyword-style queries ("asthma miami") mean the same thing in any order;
+    # longer ones carry structure ("sponsored by X in Y") so we leave them alone.
+    if len(tokens) <= SIMPLE_QUERY_MAX_TOKENS and not any(t.isdigit() for t in tokens):
+        tokens = sorted(tokens)
+    return " ".join(tokens)
+
+
+class LRUTier:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key, now):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if self.ttl and now - stored_at > self.ttl:
+            del self.data[key]
+            self.evictions += 1
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value, now):
+        self.data[key] = (now, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.data.clear()
+
+
+class EntityCache:
+    """
+    Two-tier cache for extracted entities.
+
+    The exact tier is keyed on the raw (stripped) query string, the normalized tier
+    on normalize_query(). A normalized hit is promoted into the exact tier. When
+    db_path is set, the normalized tier is also written through to SQLite so the
+    cache survives restarts.
+    """
+
+    def __init__(self, max_size=2048, ttl=24 * 3600, db_path=None):
+        self.exact = LRUTier(max_size, ttl)
+        self.normalized = LRUTier(max_size, ttl)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = {"exact": 0, "normalized": 0, "disk": 0}
+        self.misses = 0
+        self.db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        try:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS entity_cache ("
+                "key TEXT PRIMARY KEY, entities TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self.db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Entity cache DB unavailable at {db_path}: {e}. Using memory only.")
+            self.db = None
+
+    def get(self, user_query):
+        now = time.time()
+        raw_key = str(user_query).strip()
+        norm_key = normalize_query(user_query)
+        with self.lock:
+            value = self.exact.get(raw_key, now)
+            if value is not None:
+                self.hits["exact"] += 1
+                return dict(value)
+
+            value = self.normalized.get(norm_key, now)
+            if value is not None:
+                self.hits["normalized"] += 1
+                self.exact.put(raw_key, value, now)
+                return dict(value)
+
+            value = self._db_get(norm_key, now)
+            if value is not None:
+                self.hits["disk"] += 1
+                self.normalized.put(norm_key, value, now)
+                self.exact.put(raw_key, value, now)
+                return dict(value)
+
+            self.misses += 1
+            return None
+
+    def put(self, user_query, entities):
+        now = time.time()
+        value = dict(entities)
+        norm_key = normalize_query(user_query)
+        with self.lock:
+            self.exact.put(str(user_query).strip(), value, now)
+            self.normalized.put(norm_key, value, now)
+            self._db_put(norm_key, value, now)
+
+    def warm(self, limit):
+        """Loads up to `limit` of the most recently stored disk entries into the normalized tier."""
+        if self.db is None or limit <= 0:
+            return 0
+        now = time.time()
+        with self.lock:
+            try:
+                rows = self.db.execute(
+                    "SELECT key, entities, stored_at FROM entity_cache ORDER BY stored_at DESC LIMIT ?",
+                    (min(limit, self.normalized.max_size),),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Entity cache warm-up failed: {e}")
+                return 0
+            loaded = 0
+            # Oldest first, so the most recent entries end up at the hot end of the LRU.
+            for key, entities, stored_at in reversed(rows):
+                if self.ttl and now - stored_at > self.ttl:
+                    continue
+                self.normalized.put(key, json.loads(entities), stored_at)
+                loaded += 1
+            return loaded
+
+    def clear(self):
+        with self.lock:
+            self.exact.clear()
+            self.normalized.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM entity_cache")
+                self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            hits = sum(self.hits.values())
+            lookups = hits + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "evictions": self.exact.evictions + self.normalized.evictions,
+                "size": len(self.normalized.data),
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _db_get(self, key, now):
+        if self.db is None:
+            return None
+        try:
+            row = self.db.execute(
+                "SELECT entities, stored_at FROM entity_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Entity cache DB read failed: {e}")
+            return None
+        if row is None:
+            return None
+        if self.ttl and now - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def _db_put(self, key, value, now):
+        if self.db is None:
+            return
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entity_cache (key, entities, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now),
+            )
+            self.db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Entity cache DB write failed: {e}")
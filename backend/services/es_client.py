@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from elasticsearch import ApiError, AsyncElasticsearch, ConnectionError, ConnectionTimeout, Elasticsearch
+
+logger = logging.getLogger(__name__)
+
+ES_HOST = os.environ.get("ES_HOST", "http://localhost:9200")
+ES_POOL_SIZE = int(os.environ.get("ES_POOL_SIZE", "10"))
+ES_REQUEST_TIMEOUT = float(os.environ.get("ES_REQUEST_TIMEOUT", "5"))
+ES_MAX_RETRIES = int(os.environ.get("ES_MAX_RETRIES", "2"))
+ES_RETRY_BACKOFF = float(os.environ.get("ES_RETRY_BACKOFF", "0.1"))
+ES_BREAKER_FAILURES = int(os.environ.get("ES_BREAKER_FAILURES", "5"))
+ES_BREAKER_RESET = float(os.environ.get("ES_BREAKER_RESET", "10"))
+
+# Statuses that mean the cluster is overloaded or unavailable rather than that the request was bad.
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive overload/connection failures and rejects calls
+    for `reset_after` seconds, then lets a single probe through (half-open).
+    """
+
+    def __init__(self, failures=ES_BREAKER_FAILURES, reset_after=ES_BREAKER_RESET):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return
+            raise CircuitOpenError("Elasticsearch circuit is open; failing fast")
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.probing = False
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                if self.opened_at is None:
+                    logger.warning(f"Opening Elasticsearch circuit after {self.consecutive_failures} failures")
+                self.opened_at = time.monotonic()
+
+
+def _is_retryable(error):
+    if isinstance(error, (ConnectionError, ConnectionTimeout)):
+        return True
+    return isinstance(error, ApiError) and error.meta.status in RETRY_STATUSES
+
+
+class Resilience:
+    def __init__(self, max_retries, backoff, breaker):
+        self.max_attempts = max_retries + 1
+        self.backoff = backoff
+        self.breaker = breaker
+
+
+class ResilientElasticsearch(Elasticsearch):
+    """Elasticsearch client whose every API call goes through retry-with-backoff and a circuit breaker."""
+
+    def perform_request(self, *args, **kwargs):
+        resilience = self.transport.resilience
+        for attempt in range(resilience.max_attempts):
+            resilience.breaker.before_call()
+            try:
+                response = super().perform_request(*args, **kwargs)
+            except Exception as e:
+                if not _is_retryable(e):
+                    resilience.breaker.record_success()
+                    raise
+                resilience.breaker.record_failure()
+                if attempt + 1 >= resilience.max_attempts:
+                    raise
+                time.sleep(resilience.backoff * (2 ** attempt))
+            else:
+                resilience.breaker.record_success()
+                return response
+
+
+class AsyncResilientElasticsearch(AsyncElasticsearch):
+    async def perform_request(self, *args, **kwargs):
+        resilience = self.transport.resilience
+        for attempt in range(resilience.max_attempts):
+            resilience.breaker.before_call()
+            try:
+                response = await super().perform_request(*args, **kwargs)
+            except Exception as e:
+                if not _is_retryable(e):
+                    resilience.breaker.record_success()
+                    raise
+                resilience.breaker.record_failure()
+                if attempt + 1 >= resilience.max_attempts:
+                    raise
+                await asyncio.sleep(resilience.backoff * (2 ** attempt))
+            else:
+                resilience.breaker.record_success()
+                return response
+
+
+def _build(client_class, hosts, pool_size, request_timeout, max_retries, backoff, breaker, **kwargs):
+    client = client_class(
+        hosts or ES_HOST,
+        connections_per_node=pool_size,
+        http_compress=True,
+        request_timeout=request_timeout,
+        # Retries are handled in perform_request so they get backoff and feed the breaker.
+        max_retries=0,
+        retry_on_timeout=False,
+        **kwargs,
+    )
+    # Kept on the transport because clients derived through .options() share it.
+    client.transport.resilience = Resilience(max_retries, backoff, breaker or CircuitBreaker())
+    return client
+
+
+def create_client(hosts=None, pool_size=ES_POOL_SIZE, request_timeout=ES_REQUEST_TIMEOUT,
+                  max_retries=ES_MAX_RETRIES, backoff=ES_RETRY_BACKOFF, breaker=None, **kwargs):
+    return _build(ResilientElasticsearch, hosts, pool_size, request_timeout, max_retries, backoff, breaker, **kwargs)
+
+
+def create_async_client(hosts=None, pool_size=ES_POOL_SIZE, request_timeout=ES_REQUEST_TIMEOUT,
+                        max_retries=ES_MAX_RETRIES, backoff=ES_RETRY_BACKOFF, breaker=None, **kwargs):
+    return _build(AsyncResilientElasticsearch, hosts, pool_size, request_timeout, max_retries, backoff, breaker, **kwargs)
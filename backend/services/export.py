@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Fields /export can select. Dotted paths reach into the nested arrays; in CSV every
+# value found along a path is joined into one "; "-separated cell.
+EXPORT_FIELDS = (
+    "nct_id", "acronym", "brief_title", "official_title", "overall_status", "phase", "study_type",
+    "primary_purpose", "allocation", "intervention_model", "masking", "enrollment", "minimum_age",
+    "maximum_age", "gender", "healthy_volunteers", "start_date", "primary_completion_date",
+    "completion_date", "has_results", "conditions", "sponsors.name", "sponsors.agency_class",
+    "facilities.name", "facilities.city", "facilities.state", "facilities.country",
+    "interventions.name", "interventions.intervention_type",
+)
+DEFAULT_EXPORT_FIELDS = (
+    "nct_id", "brief_title", "overall_status", "phase", "study_type", "conditions", "enrollment",
+    "start_date", "completion_date", "sponsors.name",
+)
+
+CSV_SEPARATOR = "; "
+
+
+def parse_export_fields(value):
+    if not value:
+        return list(DEFAULT_EXPORT_FIELDS)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown)}")
+    return fields
+
+
+def field_values(source, path):
+    values = [source]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            value = value.get(part) if isinstance(value, dict) else None
+            if isinstance(value, list):
+                found.extend(value)
+            elif value is not None:
+                found.append(value)
+        values = found
+    return values
+
+
+def ndjson_lines(sources):
+    for source in sources:
+        yield json.dumps(source) + "\n"
+
+
+def csv_lines(sources, fields):
+    # One reusable buffer: each row is written, read back and cleared, so memory stays flat.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(fields)
+    yield flush()
+    for source in sources:
+        writer.writerow([CSV_SEPARATOR.join(str(v) for v in field_values(source, field)) for field in fields])
+        yield flush()
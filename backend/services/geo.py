@@ -0,0 +1,111 @@
+import csv
+import functools
+import os
+from pathlib import Path
+
+GAZETTEER_PATH = Path(os.environ.get(
+    "GAZETTEER_PATH", Path(__file__).resolve().parent.parent / "data" / "gazetteer.csv"
+))
+
+# Spellings users (and the LLM) reach for that differ from the registry's facility values.
+REGION_ALIASES = {
+    "usa": "United States", "us": "United States", "u.s.": "United States", "america": "United States",
+    "united states of america": "United States", "uk": "United Kingdom", "great britain": "United Kingdom",
+    "england": "United Kingdom", "south korea": "Korea, Republic of", "korea": "Korea, Republic of",
+    "russia": "Russian Federation",
+}
+
+
+def _key(value):
+    return " ".join(str(value).lower().replace(".", " ").split()) if value else ""
+
+
+class Gazetteer:
+    """
+    Offline city -> coordinates table, read from a CSV with
+    city,state,country,lat,lon,population columns (state may be empty).
+    """
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.cities = {}
+        self.regions = {}
+        if not Path(path).exists():
+            return
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                entry = (row["state"] or None, row["country"], float(row["lat"]), float(row["lon"]),
+                         int(row.get("population") or 0))
+                self.cities.setdefault(_key(row["city"]), []).append(entry)
+                for region in (row["state"], row["country"]):
+                    if region:
+                        self.regions[_key(region)] = region
+        # Most populous first, so an unqualified "Portland" resolves to the bigger one.
+        for entries in self.cities.values():
+            entries.sort(key=lambda e: -e[4])
+
+    def locate(self, city, state=None, country=None):
+        entries = self.cities.get(_key(city))
+        if not entries:
+            return None
+        state, country = _key(self.canonical_region(state)), _key(self.canonical_region(country))
+        for entry_state, entry_country, lat, lon, _ in entries:
+            if country and _key(entry_country) != country:
+                continue
+            # A state qualifier rules out entries filed without one ("Paris, Texas" is not Paris, France).
+            if state and _key(entry_state) != state:
+                continue
+            return {"lat": lat, "lon": lon}
+        return None
+
+    def is_region(self, value):
+        key = _key(value)
+        return key in REGION_ALIASES or key in self.regions
+
+    def canonical_region(self, value):
+        if not value:
+            return value
+        key = _key(value)
+        if key in REGION_ALIASES:
+            return REGION_ALIASES[key]
+        return self.regions.get(key, str(value).strip())
+
+
+@functools.lru_cache(maxsize=1)
+def gazetteer():
+    return Gazetteer()
+
+
+@functools.lru_cache(maxsize=65536)
+def locate(city, state=None, country=None):
+    """Memoized: a dump lists the same few thousand sites across hundreds of thousands of facilities."""
+    if not city:
+        return None
+    return gazetteer().locate(city, state, country)
+
+
+def geocode(place):
+    """Resolves free text like "Boston", "Boston, Massachusetts" or "Paris, France"."""
+    parts = [part.strip() for part in str(place).split(",") if part.strip()]
+    if not parts:
+        return None
+    if len(parts) > 1:
+        return _locate_qualified(parts[0], parts[1])
+    location = locate(parts[0])
+    if location is None:
+        # Punctuation-stripped queries arrive as "paris france"; try trailing words as the region.
+        words = parts[0].split()
+        for i in range(len(words) - 1, 0, -1):
+            location = _locate_qualified(" ".join(words[:i]), " ".join(words[i:]))
+            if location is not None:
+                break
+    return location
+
+
+def _locate_qualified(city, qualifier):
+    if not gazetteer().is_region(qualifier):
+        return None
+    return locate(city, country=qualifier) or locate(city, state=qualifier)
+
+
+def canonical_region(value):
+    return gazetteer().canonical_region(value)
@@ -0,0 +1,110 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from services.entity_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCoalescer:
+    """
+    Micro-batches LLM entity extraction.
+
+    submit() returns a Future. Queries arriving within `window_ms` of the first one
+    in a batch (or until `max_batch` are waiting) go to `extract_batch` together, which
+    must return one result per query in order. A query already waiting or in flight
+    (compared after normalize_query) joins the existing Future instead of being sent
+    again. At most `max_concurrency` batches are at the LLM at once; the rest queue.
+    """
+
+    def __init__(self, extract_batch, window_ms=5, max_batch=16, max_concurrency=4):
+        self.extract_batch = extract_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-batch")
+        self.lock = threading.Lock()
+        self.pending = []
+        self.inflight = {}
+        self.timer = None
+        self.closed = False
+        self.batches = 0
+        self.queries = 0
+        self.deduplicated = 0
+
+    def submit(self, query):
+        key = normalize_query(query)
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Extraction coalescer is closed")
+            future = self.inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            future = self.inflight[key] = Future()
+            self.pending.append((key, query))
+            if len(self.pending) >= self.max_batch:
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.window, self._flush)
+                self.timer.daemon = True
+                self.timer.start()
+        return future
+
+    def _flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.batches += 1
+            self.queries += len(batch)
+            try:
+                self.pool.submit(self._run, batch)
+            except RuntimeError as e:
+                # The pool is already shut down; fail the batch instead of leaving its callers waiting.
+                for key, _ in batch:
+                    self.inflight.pop(key).set_exception(e)
+
+    def _run(self, batch):
+        try:
+            results = self.extract_batch([query for _, query in batch])
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} extraction results, got {results!r:.200}")
+        except Exception as e:
+            for key, _ in batch:
+                self._settle(key, error=e)
+            return
+        for (key, query), result in zip(batch, results):
+            if isinstance(result, dict):
+                self._settle(key, result=result)
+            else:
+                self._settle(key, error=ValueError(f"Extraction result for {query!r} is not an object"))
+
+    def _settle(self, key, result=None, error=None):
+        with self.lock:
+            future = self.inflight.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "deduplicated": self.deduplicated,
+                "mean_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+                "waiting": len(self.pending),
+                "in_flight": len(self.inflight),
+            }
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self._flush_locked()
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,106 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+# Seconds; spans a cached ES hit (~1ms) to a slow Bedrock call (several seconds).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination, rendered in Prometheus text format."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = {key: (list(s["counts"]), s["sum"], s["count"]) for key, s in self.series.items()}
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            labels = dict(zip(self.labelnames, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': f'{bound:g}'})} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "search_stage_seconds", "Wall time per search stage (extract, llm, build, embed, es, serialize)", ["stage"]
+)
+ES_TOOK_SECONDS = REGISTRY.histogram("es_took_seconds", "Server-side time reported in Elasticsearch 'took'")
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "Wall time per HTTP request", ["endpoint", "status"])
+
+# Per-request breakdown in milliseconds, filled by stage() for the structured request log.
+_timings = contextvars.ContextVar("timings", default=None)
+
+
+def start_timings():
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextlib.contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0.0) + elapsed * 1000, 2)
+
+
+def record_took(took_ms):
+    if took_ms is None:
+        return
+    ES_TOOK_SECONDS.observe(took_ms / 1000)
+    timings = _timings.get()
+    if timings is not None:
+        timings["es_took"] = timings.get("es_took", 0) + took_ms
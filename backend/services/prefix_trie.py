@@ -0,0 +1,71 @@
+import heapq
+import itertools
+import threading
+
+
+class PrefixTrie:
+    """
+    In-memory snapshot of the most frequent suggestion terms.
+
+    Every node keeps its own top-k completions per kind, precomputed at build time, so
+    a lookup is one walk down the prefix plus a merge of the requested kinds' lists,
+    with no subtree traversal.
+    """
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.root = {}
+        self.size = 0
+
+    @classmethod
+    def build(cls, entries, top_k=10):
+        trie = cls(top_k)
+        # Highest weights first: each node's list is then filled in order and capped.
+        for term, kind, weight in sorted(entries, key=lambda e: -e[2]):
+            trie._insert(term, kind, weight)
+        return trie
+
+    def _insert(self, term, kind, weight):
+        key = term.lower().strip()
+        if not key:
+            return
+        entry = {"text": term, "kind": kind, "weight": weight}
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+            top = node.setdefault("", {}).setdefault(kind, [])
+            if len(top) < self.top_k:
+                top.append(entry)
+        self.size += 1
+
+    def lookup(self, prefix, kinds=None, size=10):
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        by_kind = node.get("", {})
+        lists = [by_kind[kind] for kind in (kinds or by_kind) if kind in by_kind]
+        # Each list is already in descending weight order.
+        top = heapq.merge(*lists, key=lambda entry: -entry["weight"])
+        return [{"text": entry["text"], "kind": entry["kind"]} for entry in itertools.islice(top, size)]
+
+
+class TrieSnapshot:
+    """Holds the current PrefixTrie and swaps in rebuilt ones without blocking readers."""
+
+    def __init__(self):
+        self.trie = None
+        self.lock = threading.Lock()
+
+    def replace(self, trie):
+        with self.lock:
+            self.trie = trie
+
+    def lookup(self, prefix, kinds=None, size=10):
+        trie = self.trie
+        if trie is None:
+            return None
+        results = trie.lookup(prefix, kinds, size)
+        # Only hot terms live in the trie; a short list means ES may know more.
+        return results if len(results) >= size else None
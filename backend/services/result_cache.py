@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from services.entity_cache import LRUTier
+
+logger = logging.getLogger(__name__)
+
+ENUM_ENTITIES = {"overall_status", "phase", "study_type", "intervention_type", "primary_purpose", "masking"}
+# Matched through analyzed text fields or the case-insensitive gazetteer, so case and
+# spacing don't change the results. state/country clauses canonicalize their own values.
+TEXT_ENTITIES = {"condition", "keyword", "city", "sponsor", "near"}
+
+
+def canonical_entities(entities):
+    canonical = {}
+    for key, value in entities.items():
+        if value is None or value == "":
+            continue
+        if key in ENUM_ENTITIES and isinstance(value, str):
+            value = value.strip().upper()
+        elif key in TEXT_ENTITIES and isinstance(value, str):
+            value = " ".join(value.lower().split())
+        elif key == "enrollment_size" and isinstance(value, str):
+            value = value.strip().lower()
+        canonical[key] = value
+    return canonical
+
+
+def cache_key(generation, body):
+    payload = json.dumps({"generation": generation, "body": body}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# Expired rows are deleted from SQLiteSharedTier.put() at most this often.
+SQLITE_PURGE_SECONDS = 60
+
+
+class SQLiteSharedTier:
+    """Local stand-in for a shared cache tier; several processes can point at one file."""
+
+    def __init__(self, path, ttl=300):
+        self.ttl = ttl
+        self.purged_at = 0.0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False, timeout=1)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, cost_ms REAL NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS result_cache_stored_at ON result_cache (stored_at)")
+        self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result, cost_ms, stored_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, result, cost_ms):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO result_cache (key, result, cost_ms, stored_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), cost_ms, now),
+            )
+            if now - self.purged_at >= SQLITE_PURGE_SECONDS:
+                self.db.execute("DELETE FROM result_cache WHERE stored_at < ?", (now - self.ttl,))
+                self.purged_at = now
+            self.db.commit()
+
+
+class RedisSharedTier:
+    def __init__(self, url, ttl=300):
+        import redis
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.client.get(f"results:{key}")
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["result"], entry["cost_ms"]
+
+    def put(self, key, result, cost_ms):
+        self.client.set(f"results:{key}", json.dumps({"result": result, "cost_ms": cost_ms}), ex=self.ttl)
+
+
+def shared_tier_from_url(url, ttl=300):
+    if url.startswith(("redis://", "rediss://")):
+        return RedisSharedTier(url, ttl)
+    return SQLiteSharedTier(url, ttl)
+
+
+class ResultCache:
+    """
+    In-process LRU in front of an optional shared tier for ES search responses.
+
+    Keys hash the index generation with the query body, so swapping in a new
+    generation (or bumping its data_version) makes every old entry unreachable.
+    Each entry remembers how long ES took to produce it; hits add that to saved_ms.
+    """
+
+    def __init__(self, max_size=512, ttl=300, shared=None):
+        self.local = LRUTier(max_size, ttl)
+        self.shared = shared
+        self.lock = threading.Lock()
+        self.hits = {"local": 0, "shared": 0}
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.local.get(key, now)
+            if entry is not None:
+                self.hits["local"] += 1
+                self.saved_ms += entry[1]
+                return entry[0]
+
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared result cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                with self.lock:
+                    self.hits["shared"] += 1
+                    self.saved_ms += entry[1]
+                    self.local.put(key, entry, now)
+                return entry[0]
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result, cost_ms):
+        with self.lock:
+            self.local.put(key, (result, cost_ms), time.time())
+        if self.shared is not None:
+            try:
+                self.shared.put(key, result, cost_ms)
+            except Exception as e:
+                logger.warning(f"Shared result cache write failed: {e}")
+
+    def invalidate(self):
+        with self.lock:
+            self.local.clear()
+
+    def stats(self):
+        with self.lock:
+            hits = sum(self.hits.values())
+            lookups = hits + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "evictions": self.local.evictions,
+                "size": len(self.local.data),
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "saved_ms": round(self.saved_ms, 1),
+            }
@@ -0,0 +1,299 @@
+import functools
+import os
+import re
+from pathlib import Path
+from services.geo import geocode
+
+CONDITION_TERMS_PATH = Path(os.environ.get(
+    "CONDITION_TERMS_PATH", Path(__file__).resolve().parent.parent / "data" / "condition_terms.txt"
+))
+
+# Longer phrases come first so "not yet recruiting" wins over "recruiting" and
+# "open-label" (masking) is consumed before "open" (status).
+_MASKING = [
+    (r"quadruple[\s-]?blind(?:ed)?", "QUADRUPLE"),
+    (r"triple[\s-]?blind(?:ed)?", "TRIPLE"),
+    (r"double[\s-]?blind(?:ed)?", "DOUBLE"),
+    (r"single[\s-]?blind(?:ed)?", "SINGLE"),
+    (r"open[\s-]label", "OPEN"),
+]
+
+_STATUS = [
+    (r"active,?\s+(?:but\s+)?not\s+recruiting", "ACTIVE_NOT_RECRUITING"),
+    (r"not\s+yet\s+recruiting", "NOT_YET_RECRUITING"),
+    (r"recruiting", "RECRUITING"),
+    (r"completed|finished", "COMPLETED"),
+    (r"suspended", "SUSPENDED"),
+    (r"withdrawn", "WITHDRAWN"),
+]
+
+_PHASE_NUMBERS = {"1": "PHASE1", "i": "PHASE1", "2": "PHASE2", "ii": "PHASE2",
+                  "3": "PHASE3", "iii": "PHASE3", "4": "PHASE4", "iv": "PHASE4"}
+
+_STUDY_TYPE = [
+    (r"interventional|experimental", "INTERVENTIONAL"),
+    (r"observational", "OBSERVATIONAL"),
+]
+
+_INTERVENTION_TYPE = [
+    (r"(?:medical\s+)?devices?", "DEVICE"),
+    (r"drugs?|medications?|pharmaceutical", "DRUG"),
+    (r"behaviou?ral|lifestyle", "BEHAVIORAL"),
+    (r"procedures?|surgery|surgical", "PROCEDURE"),
+]
+
+_PRIMARY_PURPOSE = [
+    (r"supportive\s+care", "SUPPORTIVE"),
+    (r"treatment|therapeutic", "TREATMENT"),
+    (r"prevention|preventive", "PREVENTION"),
+    (r"diagnostic|diagnosis", "DIAGNOSTIC"),
+    (r"screening", "SCREENING"),
+]
+
+_HEALTHY_VOLUNTEERS = [
+    (r"(?:no|without|excluding)\s+healthy\s+(?:volunteers|subjects)|patients?\s+only", False),
+    (r"(?:accept(?:s|ing)?\s+)?healthy\s+(?:volunteers|subjects)", True),
+]
+
+US_STATES = {
+    "alabama", "alaska", "arizona", "arkansas", "california", "colorado", "connecticut",
+    "delaware", "florida", "georgia", "hawaii", "idaho", "illinois", "indiana", "iowa",
+    "kansas", "kentucky", "louisiana", "maine", "maryland", "massachusetts", "michigan",
+    "minnesota", "mississippi", "missouri", "montana", "nebraska", "nevada", "new hampshire",
+    "new jersey", "new mexico", "north carolina", "north dakota", "ohio", "oklahoma",
+    "oregon", "pennsylvania", "rhode island", "south carolina", "south dakota", "tennessee",
+    "texas", "utah", "vermont", "virginia", "washington", "west virginia", "wisconsin", "wyoming",
+}
+
+COUNTRIES = {
+    "united states", "usa", "canada", "mexico", "brazil", "argentina", "united kingdom", "uk",
+    "ireland", "france", "germany", "spain", "italy", "netherlands", "belgium", "switzerland",
+    "austria", "sweden", "norway", "denmark", "finland", "poland", "greece", "portugal",
+    "russia", "turkey", "israel", "egypt", "south africa", "nigeria", "kenya", "india",
+    "china", "japan", "korea", "south korea", "taiwan", "singapore", "thailand", "australia",
+    "new zealand",
+}
+
+_COUNTRY_NAMES = {"usa": "United States", "uk": "United Kingdom"}
+
+# Words that carry no entity of their own and are safe to drop.
+_FILLER = {
+    "a", "an", "the", "for", "of", "on", "with", "and", "trial", "trials", "study", "studies",
+    "clinical", "research", "show", "find", "me", "all", "any", "list", "search", "phase",
+    "participants", "patients", "people", "subjects", "that", "are", "is",
+}
+
+# Words that signal structure the rules don't understand (negation, sponsors, ranges).
+_BLOCKERS = {"not", "no", "without", "except", "excluding", "by", "sponsored", "funded",
+             "or", "between", "than", "near", "within", "versus", "vs"}
+
+MAX_CONDITION_WORDS = 4
+KM_PER_MILE = 1.609344
+
+
+def _alt(patterns):
+    return [(re.compile(rf"\b(?:{p})\b"), value) for p, value in patterns]
+
+
+def _stem(token):
+    # Enough folding that "alzheimers", "alzheimer's" and "alzheimer" meet.
+    token = token.replace("'", "")
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+@functools.lru_cache(maxsize=None)
+def load_condition_terms(path=CONDITION_TERMS_PATH):
+    """Condition names from a one-per-line text file ('#' starts a comment); empty if it is missing."""
+    if not Path(path).exists():
+        return frozenset()
+    with open(path, encoding="utf-8") as f:
+        return frozenset(line.strip().lower() for line in f if line.strip() and not line.startswith("#"))
+
+
+class RuleExtractor:
+    """
+    Deterministic extractor for the entity vocabulary QueryBrain's prompt encodes.
+
+    extract() returns (entities, confidence). Confidence is the share of query tokens
+    explained by a rule, a filler word or a condition span made of words from the
+    condition vocabulary; anything lower than 1.0 means part of the query was not
+    understood and the LLM should have a look. Leftover text outside the vocabulary
+    ("pfizer", "children") is still returned as the condition, as a best guess.
+    """
+
+    def __init__(self, condition_terms=None):
+        if condition_terms is None:
+            condition_terms = load_condition_terms()
+        self.condition_words = {
+            _stem(word) for term in condition_terms for word in self.split_words(term)
+            if word not in _FILLER and word not in _BLOCKERS
+        }
+        self.masking = _alt(_MASKING)
+        self.status = _alt(_STATUS)
+        # "open"/"active" also qualify conditions and procedures ("open heart surgery", "active lupus").
+        self.loose_status = re.compile(r"\b(?:open|active)\b")
+        self.trial_noun = re.compile(r"\s*(?:(?:clinical|research)\s+)?(?:trials?|stud(?:y|ies))\b|\s*$")
+        self.study_type = _alt(_STUDY_TYPE)
+        self.intervention_type = _alt(_INTERVENTION_TYPE)
+        self.primary_purpose = _alt(_PRIMARY_PURPOSE)
+        self.healthy_volunteers = _alt(_HEALTHY_VOLUNTEERS)
+        self.phase = re.compile(r"\bphase\s*(iv|iii|ii|i|[1-4])[ab]?\b")
+        self.age_range = re.compile(r"\b(?:aged?s?\s+)?(\d{1,3})\s*(?:-|to)\s*(\d{1,3})(?:\s*(?:years?|yrs?)(?:\s+old)?)?\b")
+        self.age_min = re.compile(r"\b(?:aged?s?\s+)?(?:over|above|older\s+than)\s+(\d{1,3})(?:\s*(?:years?|yrs?)(?:\s+old)?)?\b|\b(?:aged?s?\s+)?(\d{1,3})\s*\+")
+        self.age_max = re.compile(r"\b(?:aged?s?\s+)?(?:under|below|younger\s+than)\s+(\d{1,3})(?:\s*(?:years?|yrs?)(?:\s+old)?)?\b")
+        self.enrollment = re.compile(
+            r"\b(?:with\s+)?(?:(less\s+than|fewer\s+than|under|more\s+than|over)\s+)?"
+            r"(\d[\d,]*)(?:\s*(?:-|to)\s*(\d[\d,]*))?\s+(?:participants|patients|subjects|people|enrolled)\b"
+        )
+        self.location = re.compile(r"\b(?:in|at)\s+([a-z][a-z .'-]*)$")
+        self.distance = re.compile(
+            r"\b(?:within\s+(\d+(?:\.\d+)?)\s*(km|kilomet(?:er|re)s?|mi|miles?)\s+(?:of|from)|near)\s+([a-z][a-z .'-]*)$"
+        )
+        self.age_units = re.compile(r"\b(?:months?|weeks?|days?)\b")
+        self.split = re.compile(r"[^\w+-]+")
+        self.punct = re.compile(r"[^\w\s+/'-]")
+
+    @staticmethod
+    def split_words(text):
+        return [w for w in re.split(r"[^\w'-]+", text) if w]
+
+    def is_condition(self, tokens):
+        # A lone "s" is what the tokenizer leaves of a possessive ("alzheimer's").
+        return all(t == "s" or _stem(t) in self.condition_words for t in tokens)
+
+    def _consume(self, text, rules):
+        for pattern, value in rules:
+            match = pattern.search(text)
+            if match:
+                return value, text[:match.start()] + " " + text[match.end():]
+        return None, text
+
+    def _consume_enrollment(self, text):
+        match = self.enrollment.search(text)
+        if not match:
+            return None, text
+        qualifier, low, high = match.group(1), match.group(2), match.group(3)
+        low = int(low.replace(",", ""))
+        count = (low + int(high.replace(",", ""))) / 2 if high else low
+        if qualifier and qualifier.startswith(("less", "fewer", "under")):
+            size = "small" if count <= 50 else "medium" if count <= 200 else None
+        elif qualifier:
+            size = "large" if count >= 200 else "medium" if count >= 50 else None
+        else:
+            size = "small" if count < 50 else "medium" if count <= 200 else "large"
+        if size is None:
+            return None, text
+        return size, text[:match.start()] + " " + text[match.end():]
+
+    def _consume_age(self, text, entities):
+        # Ages in months/weeks/days need unit conversion; leave them for the LLM.
+        if self.age_units.search(text):
+            return text
+        match = self.age_range.search(text)
+        if match:
+            entities["min_age"] = int(match.group(1))
+            entities["max_age"] = int(match.group(2))
+            return text[:match.start()] + " " + text[match.end():]
+        match = self.age_min.search(text)
+        if match:
+            entities["min_age"] = int(match.group(1) or match.group(2))
+            text = text[:match.start()] + " " + text[match.end():]
+        match = self.age_max.search(text)
+        if match:
+            entities["max_age"] = int(match.group(1))
+            text = text[:match.start()] + " " + text[match.end():]
+        return text
+
+    def _consume_distance(self, text, entities):
+        match = self.distance.search(text.strip())
+        if not match:
+            return text
+        place = " ".join(match.group(3).split())
+        if not place or any(w in _BLOCKERS or w in _FILLER for w in place.split()):
+            return text
+        entities["near"] = place.title()
+        if match.group(1):
+            distance = float(match.group(1))
+            entities["distance_km"] = round(distance * KM_PER_MILE if match.group(2).startswith("mi") else distance)
+        return text.strip()[:match.start()]
+
+    def _consume_status(self, text, entities):
+        """Returns (text, unexplained word count)."""
+        value, text = self._consume(text, self.status)
+        if value:
+            entities["overall_status"] = value
+            return text, 0
+        match = self.loose_status.search(text)
+        if not match:
+            return text, 0
+        entities["overall_status"] = "RECRUITING"
+        # Only explained when it qualifies the trials themselves: "open trials", "... that are active".
+        unexplained = 0 if self.trial_noun.match(text, match.end()) else 1
+        return text[:match.start()] + " " + text[match.end():], unexplained
+
+    def _consume_location(self, text, entities):
+        """Returns (text, unexplained word count)."""
+        match = self.location.search(text.strip())
+        if not match:
+            return text, 0
+        place = " ".join(match.group(1).split())
+        if not place or any(w in _BLOCKERS or w in _FILLER for w in place.split()):
+            return text, 0
+        unexplained = 0
+        if place in COUNTRIES:
+            entities["country"] = _COUNTRY_NAMES.get(place, place.title())
+        elif place in US_STATES:
+            entities["state"] = place.title()
+        else:
+            entities["city"] = place.title()
+            # "asthma in children", "cancer in women": a guess for the fallback, not an understood place.
+            if geocode(place) is None:
+                unexplained = len(place.split())
+        return text.strip()[:match.start()], unexplained
+
+    def extract(self, user_query):
+        text = " " + self.punct.sub(" ", str(user_query).lower()).strip() + " "
+        total = len([t for t in self.split.split(text) if t])
+        if not total:
+            return {}, 0.0
+
+        entities = {}
+        value, text = self._consume(text, self.masking)
+        if value:
+            entities["masking"] = value
+        value, text = self._consume(text, self.healthy_volunteers)
+        if value is not None:
+            entities["healthy_volunteers"] = value
+        text, unexplained = self._consume_status(text, entities)
+
+        match = self.phase.search(text)
+        if match:
+            entities["phase"] = _PHASE_NUMBERS[match.group(1)]
+            text = text[:match.start()] + " " + text[match.end():]
+
+        value, text = self._consume_enrollment(text)
+        if value:
+            entities["enrollment_size"] = value
+        text = self._consume_age(text, entities)
+
+        for key, rules in (("study_type", self.study_type),
+                           ("intervention_type", self.intervention_type),
+                           ("primary_purpose", self.primary_purpose)):
+            value, text = self._consume(text, rules)
+            if value:
+                entities[key] = value
+
+        text = self._consume_distance(text, entities)
+        text, unplaced = self._consume_location(text, entities)
+        unexplained += unplaced
+
+        leftover = [t for t in self.split.split(text) if t and t not in _FILLER]
+        if leftover:
+            clean = (len(leftover) <= MAX_CONDITION_WORDS
+                     and not any(t in _BLOCKERS or any(c.isdigit() for c in t) for t in leftover))
+            if clean:
+                entities["condition"] = " ".join(leftover).capitalize()
+            if not clean or not self.is_condition(leftover):
+                unexplained += len(leftover)
+
+        return entities, round(max(0.0, 1.0 - unexplained / total), 3)
@@ -1,176 +1,689 @@
-class SearchEngine:
-    def __init__(self, es_client):
-        self.es = es_client
-        self.index = "clinical_trials_es"
+import base64
+import json
+import logging
+import os
+import time
+from elasticsearch import NotFoundError
+from services.geo import canonical_region, geocode
+from services.metrics import record_took, stage
+from services.result_cache import cache_key, canonical_entities
 
-    def execute(self, entities):
-        must_clauses = []
-        search_text = entities.get("condition") or entities.get("keyword")
-        if search_text:
-            must_clauses.append({
-                "multi_match": {
-                    "query": search_text,
-                    "fields": ["brief_title^3", "official_title^2", "conditions"],
-                    "fuzziness": "AUTO"
-                }
-            })
-
-        if entities.get("phase"):
-            must_clauses.append({"match": {"phase": {"query": entities["phase"]}}})
-        
-        if entities.get("overall_status"):
-            status_val = entities["overall_status"].upper()
-            must_clauses.append({
-                "bool": {
-                    "should": [
-                        {
-                            "term": { "overall_status": status_val }
-                        },
-                        {
-                            "nested": {
-                                "path": "facilities",
-                                "query": {
-                                    "term": { "facilities.status": status_val }
-                                }
-                            }
-                        }
-                    ],
-                    "minimum_should_match": 1
-                }
-            })
-
-        if entities.get("city"):
-            must_clauses.append({
-                "nested": {
-                    "path": "facilities",
-                    "score_mode": "max",
-                    "query": {
-                        "match": { "facilities.city": {
-                            "query": entities["city"], 
-                            "fuzziness": "AUTO"} }
-                    }
-                }
-            })
-        
-        if entities.get("state"):
-            must_clauses.append({
-                "nested": {
-                    "path": "facilities",
-                    "score_mode": "max",
-                    "query": {
-                        "match": { "facilities.state": {
-                            "query": entities["state"], 
-                            "fuzziness": "AUTO"} }
-                    }
-                }
-            })
-        
-        if entities.get("country"):
-            must_clauses.append({
-                "nested": {
-                    "path": "facilities",
-                    "score_mode": "max",
-                    "query": {
-                        "match": { 
-                            "facilities.country": {
-                                "query": entities["country"], 
-                                "fuzziness": "AUTO"
-                            } 
-                        }
-                    }
-                }
-            })
-
-        if entities.get("sponsor"):
-            must_clauses.append({
-                "nested": {
-                    "path": "sponsors",
-                    "score_mode": "avg",
-                    "query": {
-                        "bool": {
-                            "should": [
-                                { "match": { "sponsors.name": { "query": entities["sponsor"], "fuzziness": "AUTO" } } },
-                                { "term": { "sponsors.agency_class": entities["sponsor"].upper() } }
-                            ]
+logger = logging.getLogger(__name__)
+slow_log = logging.getLogger("search.slow")
+
+# Searches taking at least this long (wall time, ms) are logged with their full DSL.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "500"))
+
+# How often the cache re-reads which generation the alias points at.
+GENERATION_CHECK_SECONDS = 5
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# index.max_result_window: from + size beyond this is rejected by ES; deeper pages need a cursor.
+MAX_RESULT_WINDOW = 10000
+
+# Fields the result list renders. The nested facilities/interventions/outcomes/groups
+# arrays are only sent by the /trial/<nct_id> detail view.
+LIST_SOURCE = [
+    "nct_id", "brief_title", "acronym", "overall_status", "phase", "study_type",
+    "primary_purpose", "conditions", "enrollment", "start_date", "completion_date",
+    "sponsors.name", "sponsors.lead_or_collaborator",
+]
+
+# Completion-field inputs and vectors, not something to show a user.
+FULL_SOURCE = {"excludes": ["suggest", "embedding"]}
+
+SUGGEST_KINDS = ("condition", "sponsor", "city", "intervention")
+# Keyword fields the in-process trie snapshot is built from, per suggestion kind.
+SUGGEST_SNAPSHOT_FIELDS = {
+    "condition": (None, "conditions.keyword"),
+    "sponsor": ("sponsors", "sponsors.name.keyword"),
+    "city": ("facilities", "facilities.city.keyword"),
+    "intervention": ("interventions", "interventions.name.keyword"),
+}
+
+SEARCH_MODES = ("keyword", "hybrid", "semantic")
+# Entities whose text is embedded for the kNN half of hybrid/semantic search.
+SEMANTIC_ENTITIES = ("condition", "keyword")
+# Hits taken from each ranking before fusion, and the rank constant from the RRF paper.
+RRF_WINDOW = 100
+RRF_K = 60
+KNN_NUM_CANDIDATES = 200
+
+# /export pages through a point-in-time in _shard_doc order, the cheapest stable sort.
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_KEEP_ALIVE = "2m"
+
+# _score ties are broken on nct_id so search_after cursors are stable across pages.
+SORT = [{"_score": "desc"}, {"nct_id": "asc"}]
+
+
+class UnsupportedSearchError(ValueError):
+    """A search the live index cannot answer as asked, e.g. kNN without an embedding field."""
+
+
+def encode_cursor(sort_values):
+    return base64.urlsafe_b64encode(json.dumps(sort_values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def parse_paging(args):
+    try:
+        page = int(args.get('page', 1))
+        page_size = min(int(args.get('page_size', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except (TypeError, ValueError) as e:
+        # JSON bodies can carry null or a list here, not just a malformed string.
+        raise ValueError("page and page_size must be integers") from e
+    if page < 1 or page_size < 0:
+        raise ValueError("page must be positive and page_size non-negative")
+    view = args.get('view', 'list')
+    if view not in ('list', 'full'):
+        raise ValueError(f"Unknown view: {view}")
+    cursor = args.get('cursor')
+    if cursor:
+        decode_cursor(cursor)
+    elif page * page_size > MAX_RESULT_WINDOW:
+        raise ValueError(f"page * page_size may not exceed {MAX_RESULT_WINDOW}; use cursor to page deeper")
+    return {"page": page, "page_size": page_size, "cursor": cursor, "view": view}
+
+
+def parse_mode(value):
+    mode = value or "keyword"
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    return mode
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merges ranked hit lists by summed 1 / (k + rank); ties fall back to _id for stable pages."""
+    scores, hits = {}, {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, 1):
+            scores[hit['_id']] = scores.get(hit['_id'], 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit['_id'], hit)
+    ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+    return [dict(hits[doc_id], _score=scores[doc_id]) for doc_id in ranked]
+
+
+def next_cursor(results, page_size):
+    hits = results['hits']['hits']
+    if not hits or len(hits) < page_size or 'sort' not in hits[-1]:
+        return None
+    return encode_cursor(hits[-1]['sort'])
+
+
+MUST = "must"
+FILTER = "filter"
+
+# entity name -> (bool context, builder). Builders take (value, entities) and return an
+# ES clause or None. Exact-match and range clauses go in FILTER so ES skips scoring and
+# can reuse its cached filter bitsets; only fuzzy text matching contributes to _score.
+CLAUSES = {}
+
+
+def register_clause(entity, context=FILTER):
+    def decorator(builder):
+        CLAUSES[entity] = (context, builder)
+        return builder
+    return decorator
+
+
+def _text_clause(search_text):
+    return {
+        "multi_match": {
+            "query": search_text,
+            "fields": ["brief_title^3", "official_title^2", "conditions"],
+            "fuzziness": "AUTO"
+        }
+    }
+
+
+@register_clause("condition", MUST)
+def condition_clause(value, entities):
+    return _text_clause(value)
+
+
+@register_clause("keyword", MUST)
+def keyword_clause(value, entities):
+    if entities.get("condition"):
+        return None
+    return _text_clause(value)
+
+
+@register_clause("phase")
+def phase_clause(value, entities):
+    return {"term": {"phase": value.upper()}}
+
+
+@register_clause("overall_status")
+def status_clause(value, entities):
+    status_val = value.upper()
+    return {
+        "bool": {
+            "should": [
+                {
+                    "term": { "overall_status": status_val }
+                },
+                {
+                    "nested": {
+                        "path": "facilities",
+                        "query": {
+                            "term": { "facilities.status": status_val }
                         }
                     }
                 }
-            })
-
-        if entities.get("study_type"):
-            must_clauses.append({
-                "term": { "study_type": entities["study_type"].upper() }
-            })
-
-        if entities.get("intervention_type"):
-            must_clauses.append({
-                "nested": {
-                    "path": "interventions",
-                    "query": {
-                        "term": { "interventions.intervention_type": entities["intervention_type"].upper() }
-                    }
+            ],
+            "minimum_should_match": 1
+        }
+    }
+
+
+def _facility_text(field, value):
+    return {"match": {f"facilities.{field}": {"query": value, "fuzziness": "AUTO"}}}
+
+
+def _facility_match(field, value):
+    return {
+        "nested": {
+            "path": "facilities",
+            "score_mode": "max",
+            "query": _facility_text(field, value)
+        }
+    }
+
+
+@register_clause("city", MUST)
+def city_clause(value, entities):
+    return _facility_match("city", value)
+
+
+def _facility_term(field, value):
+    return {
+        "nested": {
+            "path": "facilities",
+            "query": {"term": {f"facilities.{field}": canonical_region(value)}}
+        }
+    }
+
+
+# state/country are keyword fields, so they get an exact term on the registry's spelling
+# in filter context rather than a scored fuzzy match.
+@register_clause("state")
+def state_clause(value, entities):
+    return _facility_term("state", value)
+
+
+@register_clause("country")
+def country_clause(value, entities):
+    return _facility_term("country", value)
+
+
+DEFAULT_DISTANCE_KM = 50
+MAX_DISTANCE_KM = 2000
+
+
+def _place_match(place):
+    """Facilities whose city matches `place`, narrowed by its ", state" or ", country" qualifier if any."""
+    parts = [part.strip() for part in place.split(",") if part.strip()] or [place]
+    query = {"bool": {"must": [_facility_text("city", parts[0])]}}
+    if len(parts) > 1:
+        region = canonical_region(parts[1])
+        query["bool"]["filter"] = [{"bool": {"should": [
+            {"term": {"facilities.state": region}},
+            {"term": {"facilities.country": region}},
+        ], "minimum_should_match": 1}}]
+    return query
+
+
+@register_clause("near")
+def near_clause(value, entities):
+    location = geocode(value)
+    if location is None:
+        # Not in the gazetteer: fall back to matching the facility city by name.
+        return {"nested": {"path": "facilities", "query": _place_match(value)}}
+    try:
+        distance = float(entities.get("distance_km") or DEFAULT_DISTANCE_KM)
+    except (ValueError, TypeError):
+        distance = DEFAULT_DISTANCE_KM
+    distance = min(max(distance, 1), MAX_DISTANCE_KM)
+    return {
+        "nested": {
+            "path": "facilities",
+            "query": {"bool": {"should": [
+                {"geo_distance": {"distance": f"{distance:g}km", "facilities.location": location}},
+                # Sites the gazetteer could not place have no location; keep them if the city itself matches.
+                {"bool": {
+                    "must_not": [{"exists": {"field": "facilities.location"}}],
+                    "must": [_place_match(value)],
+                }},
+            ], "minimum_should_match": 1}}
+        }
+    }
+
+
+@register_clause("sponsor", MUST)
+def sponsor_clause(value, entities):
+    return {
+        "nested": {
+            "path": "sponsors",
+            "score_mode": "avg",
+            "query": {
+                "bool": {
+                    "should": [
+                        { "match": { "sponsors.name": { "query": value, "fuzziness": "AUTO" } } },
+                        { "term": { "sponsors.agency_class": value.upper() } }
+                    ]
                 }
-            })
+            }
+        }
+    }
 
-        if entities.get("primary_purpose"):
-            must_clauses.append({
-                "term": { "primary_purpose": entities["primary_purpose"].upper() }
-            })
 
-       
-        if entities.get("masking"):
-            must_clauses.append({
-                "term": { "masking": entities["masking"].upper() }
-            })
+@register_clause("study_type")
+def study_type_clause(value, entities):
+    return {"term": { "study_type": value.upper() }}
 
-        if entities.get("min_age"):
-            try:
-                min_age = int(entities["min_age"])
-                must_clauses.append({
-                    "range": {
-                        "maximum_age": { "gte": min_age }
-                    }
-                })
-            except (ValueError, TypeError):
-                pass
 
-        if entities.get("max_age"):
+@register_clause("intervention_type")
+def intervention_type_clause(value, entities):
+    return {
+        "nested": {
+            "path": "interventions",
+            "query": {
+                "term": { "interventions.intervention_type": value.upper() }
+            }
+        }
+    }
+
+
+@register_clause("primary_purpose")
+def primary_purpose_clause(value, entities):
+    return {"term": { "primary_purpose": value.upper() }}
+
+
+@register_clause("masking")
+def masking_clause(value, entities):
+    return {"term": { "masking": value.upper() }}
+
+
+@register_clause("min_age")
+def min_age_clause(value, entities):
+    try:
+        age = int(value)
+    except (ValueError, TypeError):
+        return None
+    return {"range": {"maximum_age": { "gte": age }}} if age > 0 else None
+
+
+@register_clause("max_age")
+def max_age_clause(value, entities):
+    try:
+        age = int(value)
+    except (ValueError, TypeError):
+        return None
+    return {"range": {"minimum_age": { "lte": age }}} if age > 0 else None
+
+
+@register_clause("healthy_volunteers")
+def healthy_volunteers_clause(value, entities):
+    return {"term": { "healthy_volunteers": value }}
+
+
+ENROLLMENT_RANGES = {
+    "small": {"to": 50},
+    "medium": {"gte": 50, "lte": 200},
+    "large": {"gte": 200}
+}
+
+
+@register_clause("enrollment_size")
+def enrollment_clause(value, entities):
+    enrollment_range = ENROLLMENT_RANGES.get(str(value).lower())
+    if enrollment_range is None:
+        return None
+    return {"range": {"enrollment": enrollment_range}}
+
+
+def build_bool(entities):
+    clauses = {MUST: [], FILTER: []}
+    for entity, (context, builder) in CLAUSES.items():
+        value = entities.get(entity)
+        if value is None or value == "":
+            continue
+        clause = builder(value, entities)
+        if clause is not None:
+            clauses[context].append(clause)
+    return clauses
+
+
+FACET_SIZE = 20
+
+
+def _terms(field):
+    return {"terms": {"field": field, "size": FACET_SIZE}}
+
+
+def _nested_terms(path, field):
+    # reverse_nested turns per-facility/per-intervention counts back into trial counts.
+    return {
+        "nested": {"path": path},
+        "aggs": {
+            "values": {
+                "terms": {"field": field, "size": FACET_SIZE, "order": {"trials": "desc"}},
+                "aggs": {"trials": {"reverse_nested": {}}},
+            }
+        },
+    }
+
+
+FACETS = {
+    "phase": _terms("phase"),
+    "overall_status": _terms("overall_status"),
+    "study_type": _terms("study_type"),
+    "country": _nested_terms("facilities", "facilities.country"),
+    "sponsor_class": _nested_terms("sponsors", "sponsors.agency_class"),
+    "intervention_type": _nested_terms("interventions", "interventions.intervention_type"),
+}
+
+
+def parse_facets(value):
+    if not value:
+        return []
+    if value == "all":
+        return list(FACETS)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValueError(f"Unknown facets: {', '.join(unknown)}")
+    return names
+
+
+def format_facets(results):
+    facets = {}
+    for name, agg in results.get('aggregations', {}).items():
+        if 'values' in agg:
+            buckets = [{"value": b['key'], "count": b['trials']['doc_count']} for b in agg['values']['buckets']]
+        else:
+            buckets = [{"value": b['key'], "count": b['doc_count']} for b in agg['buckets']]
+        facets[name] = buckets
+    return facets
+
+
+class SearchEngine:
+    def __init__(self, es_client, cache=None, encoder=None):
+        self.es = es_client
+        self.index = "clinical_trials_es"
+        self.cache = cache
+        self.encoder = encoder
+        self.generation = None
+        self.generation_checked = 0.0
+        # Whether every index behind the alias has an `embedding` field; None until the mapping is read.
+        self.has_embeddings = None
+        # Called with the new generation whenever the alias target or data_version changes.
+        self.generation_listeners = []
+
+    def execute(self, entities, page=1, page_size=DEFAULT_PAGE_SIZE, cursor=None, view="list", facets=(),
+                mode="keyword"):
+        if mode != "keyword" and cursor:
+            raise UnsupportedSearchError(f"mode={mode} pages by page only; cursor needs mode=keyword")
+        if mode != "keyword" and page_size and self.semantic_text(entities):
+            return self.execute_semantic(entities, page, page_size, view, facets, mode)
+        options = {"page": page, "page_size": page_size, "cursor": cursor, "view": view, "facets": facets}
+        with stage("build"):
+            body = self.build_query(entities, **options)
+        if self.cache is None:
+            return self._search(body)
+
+        generation = self.current_generation()
+        if generation is None:
+            return self._search(body)
+        key = cache_key(generation, self.build_query(canonical_entities(entities), **options))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        results = self._search(body)
+        results = getattr(results, "body", results)
+        self.cache.put(key, results, (time.perf_counter() - started) * 1000)
+        return results
+
+    def _search(self, body, msearch=False):
+        """Runs one search (or an _msearch body), feeding the stage timers and the slow-query log."""
+        started = time.perf_counter()
+        with stage("es"):
+            if msearch:
+                results = self.es.msearch(body=body)
+            else:
+                results = self.es.search(index=self.index, body=body)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        took = getattr(results, "body", results).get('took')
+        record_took(took)
+        if elapsed_ms >= SLOW_QUERY_MS:
+            slow_log.warning("slow query", extra={"fields": {
+                "index": self.index, "elapsed_ms": round(elapsed_ms, 1), "took_ms": took, "dsl": body,
+            }})
+        return results
+
+    def semantic_text(self, entities):
+        if self.encoder is None:
+            return None
+        return next((entities[name] for name in SEMANTIC_ENTITIES if entities.get(name)), None)
+
+    def execute_semantic(self, entities, page=1, page_size=DEFAULT_PAGE_SIZE, view="list", facets=(), mode="hybrid"):
+        """
+        kNN over the trial embeddings, fused with the BM25 ranking by reciprocal rank
+        fusion in hybrid mode. Pages come out of one fused window, so results carry
+        no search_after cursor and are not put in the result cache.
+        """
+        if page * page_size > MAX_RESULT_WINDOW:
+            raise UnsupportedSearchError(f"{mode} search only reaches the first {MAX_RESULT_WINDOW} hits")
+        self.current_generation()
+        if self.has_embeddings is False:
+            raise UnsupportedSearchError(f"mode={mode} needs an index built with --embeddings")
+        window = max(RRF_WINDOW, page * page_size)
+        with stage("embed"):
+            vector = self.encoder.encode([self.semantic_text(entities)])[0]
+        with stage("build"):
+            knn_body = self.build_knn_query(entities, vector, window, view, facets if mode == "semantic" else ())
+            if mode != "semantic":
+                keyword_body = self.build_query(entities, page_size=window, view=view, facets=facets)
+        if mode == "semantic":
+            responses = [self._search(knn_body)]
+        else:
+            msearch_body = [{"index": self.index}, keyword_body, {"index": self.index}, knn_body]
+            responses = self._search(msearch_body, msearch=True)['responses']
+            for response in responses:
+                if 'error' in response:
+                    raise RuntimeError(f"Search failed: {response['error']}")
+
+        rankings = [response['hits']['hits'] for response in responses]
+        hits = rankings[0] if mode == "semantic" else reciprocal_rank_fusion(rankings)
+        # BM25 hits carry sort values, but they mean nothing in the fused order; drop them so no cursor is offered.
+        hits = [{k: v for k, v in hit.items() if k != 'sort'} for hit in hits]
+        offset = (page - 1) * page_size
+        total = responses[0]['hits']['total']
+        results = {
+            "took": max(response['took'] for response in responses),
+            "hits": {
+                "total": dict(total, value=max(len(hits), total['value'])),
+                "hits": hits[offset:offset + page_size],
+            },
+        }
+        if 'aggregations' in responses[0]:
+            results["aggregations"] = responses[0]['aggregations']
+        return results
+
+    def build_knn_query(self, entities, vector, k, view="list", facets=()):
+        # The text itself is what the vector stands for; every other entity still narrows the candidates.
+        filters = build_bool({name: value for name, value in entities.items() if name not in SEMANTIC_ENTITIES})
+        query = {
+            "knn": {
+                "field": "embedding",
+                "query_vector": vector,
+                "k": k,
+                "num_candidates": max(k, KNN_NUM_CANDIDATES),
+                "filter": {"bool": filters},
+            },
+            "size": k,
+            "_source": LIST_SOURCE if view == "list" else FULL_SOURCE,
+        }
+        if facets:
+            query["aggs"] = {name: FACETS[name] for name in facets}
+        return query
+
+    def current_generation(self):
+        now = time.monotonic()
+        if now - self.generation_checked < GENERATION_CHECK_SECONDS:
+            return self.generation
+        try:
+            mappings = self.es.indices.get_mapping(index=self.index)
+        except Exception as e:
+            logger.warning(f"Could not resolve index generation, bypassing result cache: {e}")
+            return None
+        # The alias target changes on a full reload; _meta.data_version changes on a delta load.
+        generation = ",".join(
+            f"{name}@{mapping['mappings'].get('_meta', {}).get('data_version', '')}"
+            for name, mapping in sorted(mappings.items())
+        )
+        self.has_embeddings = all(
+            "embedding" in mapping['mappings'].get('properties', {}) for mapping in mappings.values()
+        )
+        if self.generation is not None and generation != self.generation:
+            logger.info(f"Index generation changed to {generation}; dropping cached results")
+            if self.cache is not None:
+                self.cache.invalidate()
+            for listener in self.generation_listeners:
+                listener(generation)
+        self.generation = generation
+        self.generation_checked = now
+        return generation
+
+    def msearch(self, entities_list, page=1, page_size=DEFAULT_PAGE_SIZE, cursor=None, view="list"):
+        body = []
+        for entities in entities_list:
+            body.append({"index": self.index})
+            body.append(self.build_query(entities, page=page, page_size=page_size, cursor=cursor, view=view))
+        return self._search(body, msearch=True)['responses']
+
+    def export(self, entities, fields, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Returns a generator over the _source of every matching trial, restricted to
+        `fields`. It walks a point-in-time with search_after, so only one batch is held
+        at a time and the result set stays consistent even if the alias is swapped
+        mid-export. The PIT is opened here so failures surface before streaming starts.
+        """
+        pit_id = self.es.open_point_in_time(index=self.index, keep_alive=EXPORT_KEEP_ALIVE)['id']
+        body = {
+            "query": {"bool": build_bool(entities)},
+            "size": batch_size,
+            "_source": list(fields),
+            "sort": [{"_shard_doc": "asc"}],
+            "track_total_hits": False,
+        }
+        return self._walk_pit(pit_id, body)
+
+    def _walk_pit(self, pit_id, body):
+        try:
+            while True:
+                body["pit"] = {"id": pit_id, "keep_alive": EXPORT_KEEP_ALIVE}
+                response = self.es.search(body=body)
+                pit_id = response['pit_id']
+                hits = response['hits']['hits']
+                for hit in hits:
+                    yield hit.get('_source', {})
+                if len(hits) < body["size"]:
+                    return
+                body["search_after"] = hits[-1]['sort']
+        finally:
             try:
-                max_age = int(entities["max_age"])
-                must_clauses.append({
-                    "range": {
-                        "minimum_age": { "lte": max_age }
+                self.es.close_point_in_time(id=pit_id)
+            except Exception as e:
+                logger.warning(f"Could not close export point-in-time: {e}")
+
+    def get_trial(self, nct_id):
+        try:
+            return self.es.get(index=self.index, id=nct_id, source_excludes=FULL_SOURCE["excludes"])['_source']
+        except NotFoundError:
+            return None
+
+    def suggest(self, prefix, kinds=SUGGEST_KINDS, size=10):
+        body = {
+            "_source": False,
+            "suggest": {
+                "terms": {
+                    "prefix": prefix,
+                    "completion": {
+                        "field": "suggest",
+                        "size": size,
+                        "skip_duplicates": True,
+                        "contexts": {"kind": list(kinds)}
                     }
-                })
-            except (ValueError, TypeError):
-                pass
-
-        if "healthy_volunteers" in entities:
-            must_clauses.append({
-                "term": { "healthy_volunteers": entities["healthy_volunteers"] }
-            })
-
-        if entities.get("enrollment_size"):
-            enrollment_ranges = {
-                "small": {"to": 50},
-                "medium": {"gte": 50, "lte": 200},
-                "large": {"gte": 200}
+                }
             }
-            size = entities["enrollment_size"].lower()
-            if size in enrollment_ranges:
-                must_clauses.append({
-                    "range": {
-                        "enrollment": enrollment_ranges[size]
-                    }
-                })
+        }
+        results = self.es.search(index=self.index, body=body)
+        return [
+            {"text": option['text'], "kind": (option.get('contexts', {}).get('kind') or [None])[0]}
+            for option in results['suggest']['terms'][0]['options']
+        ]
+
+    def suggest_snapshot(self, terms_per_kind=2000):
+        aggs = {}
+        for kind, (path, field) in SUGGEST_SNAPSHOT_FIELDS.items():
+            terms = {"terms": {"field": field, "size": terms_per_kind}}
+            aggs[kind] = {"nested": {"path": path}, "aggs": {"values": terms}} if path else terms
+        results = self.es.search(index=self.index, body={"size": 0, "aggs": aggs})
+        entries = []
+        for kind, agg in results['aggregations'].items():
+            buckets = agg['values']['buckets'] if 'values' in agg else agg['buckets']
+            entries.extend((bucket['key'], kind, bucket['doc_count']) for bucket in buckets)
+        return entries
 
+    def build_query(self, entities, page=1, page_size=DEFAULT_PAGE_SIZE, cursor=None, view="list", facets=()):
         query = {
             "query": {
-                "bool": {
-                    "must": must_clauses
-                }
+                "bool": build_bool(entities)
             },
-            "size": 1000
+            "size": page_size
         }
-        
-        return self.es.search(index=self.index, body=query)
\ No newline at end of file
+
+        if facets:
+            query["aggs"] = {name: FACETS[name] for name in facets}
+
+        if page_size == 0:
+            # Counts only: no hits to sort, fetch or page through.
+            return query
+
+        query["sort"] = SORT
+        query["_source"] = LIST_SOURCE if view == "list" else FULL_SOURCE
+
+        if cursor:
+            query["search_after"] = decode_cursor(cursor)
+        elif page > 1:
+            query["from"] = (int(page) - 1) * query["size"]
+
+        return query
+
+
+class AsyncSearchEngine(SearchEngine):
+    """Same query builder as SearchEngine, executed through an AsyncElasticsearch client."""
+
+    async def execute(self, entities, page=1, page_size=DEFAULT_PAGE_SIZE, cursor=None, view="list", facets=()):
+        body = self.build_query(entities, page=page, page_size=page_size, cursor=cursor, view=view, facets=facets)
+        return await self.es.search(index=self.index, body=body)
+
+    async def get_trial(self, nct_id):
+        try:
+            return (await self.es.get(index=self.index, id=nct_id, source_excludes=FULL_SOURCE["excludes"]))['_source']
+        except NotFoundError:
+            return None
\ No newline at end of file
@@ -0,0 +1,35 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# "json" for one object per line (log shippers); "text" for a human-readable console.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record. Structured fields are passed as
+    logger.info("event", extra={"fields": {...}}) and merged into the object.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    # force: modules that ran logging.basicConfig at import would otherwise keep their handler.
+    logging.basicConfig(level=level, handlers=[handler], force=True)
@@ -0,0 +1,167 @@
+import io
+import json
+import threading
+import pytest
+from benchmarks.stub_bedrock import StubBedrock
+from services.brain import QueryBrain
+from services.entity_cache import EntityCache
+from services.llm_batcher import ExtractionCoalescer
+
+WINDOW_MS = 50
+
+
+@pytest.fixture
+def stub():
+    return StubBedrock(latency_ms=20)
+
+
+@pytest.fixture
+def brain(stub):
+    brain = QueryBrain(cache=EntityCache(max_size=1), bedrock=stub)
+    yield brain
+    brain.close()
+
+
+@pytest.fixture
+def coalescers():
+    created = []
+
+    def make(extract_batch, **kwargs):
+        kwargs.setdefault("window_ms", WINDOW_MS)
+        created.append(ExtractionCoalescer(extract_batch, **kwargs))
+        return created[-1]
+
+    yield make
+    for coalescer in created:
+        coalescer.close()
+
+
+def test_queries_within_the_window_share_one_prompt(brain, stub, coalescers):
+    coalescer = coalescers(brain._invoke_batch)
+    queries = ["melanoma trials in boston", "recruiting asthma", "phase 2 lupus"]
+    futures = [coalescer.submit(query) for query in queries]
+
+    results = [future.result(timeout=5) for future in futures]
+
+    assert stub.calls == 1
+    assert [result["condition"] for result in results] == ["Melanoma", "Asthma", "Lupus"]
+    assert coalescer.stats()["batches"] == 1
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window(brain, stub, coalescers):
+    coalescer = coalescers(brain._invoke_batch, window_ms=10_000, max_batch=2)
+    futures = [coalescer.submit(query) for query in ("asthma", "lupus")]
+
+    assert [future.result(timeout=5)["condition"] for future in futures] == ["Asthma", "Lupus"]
+    assert stub.calls == 1
+
+
+def test_duplicate_queries_share_one_future(brain, stub, coalescers):
+    coalescer = coalescers(brain._invoke_batch)
+    first = coalescer.submit("asthma miami")
+    # Same query after normalize_query: case, spacing and word order differ.
+    second = coalescer.submit("Miami   Asthma")
+
+    assert second is first
+    first.result(timeout=5)
+    assert stub.calls == 1
+    assert coalescer.stats()["deduplicated"] == 1
+    assert coalescer.stats()["queries"] == 1
+
+
+def test_wrong_length_result_fails_the_whole_batch(brain, coalescers):
+    coalescer = coalescers(lambda queries: brain._invoke_batch(queries)[:-1])
+    futures = [coalescer.submit(query) for query in ("asthma", "lupus", "gout")]
+
+    for future in futures:
+        with pytest.raises(ValueError, match="Expected 3 extraction results"):
+            future.result(timeout=5)
+
+
+def test_malformed_response_fails_the_whole_batch(coalescers):
+    class MalformedBedrock(StubBedrock):
+        # Answers with the JSON array cut short, as a max_tokens stop would.
+        def invoke_model(self, body, modelId=None, **kwargs):
+            payload = json.loads(super().invoke_model(body, modelId, **kwargs)["body"].read())
+            payload["content"][0]["text"] = payload["content"][0]["text"][:-1]
+            return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    brain = QueryBrain(cache=EntityCache(max_size=1), bedrock=MalformedBedrock(latency_ms=0))
+    coalescer = coalescers(brain._invoke_batch)
+    futures = [coalescer.submit(query) for query in ("asthma", "lupus")]
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    brain.close()
+
+
+def test_non_object_element_fails_only_its_query(brain, coalescers):
+    def extract_batch(queries):
+        results = brain._invoke_batch(queries)
+        results[1] = "lupus"
+        return results
+
+    coalescer = coalescers(extract_batch)
+    asthma, lupus, gout = (coalescer.submit(query) for query in ("asthma", "lupus", "gout"))
+
+    assert asthma.result(timeout=5)["condition"] == "Asthma"
+    assert gout.result(timeout=5)["condition"] == "Gout"
+    with pytest.raises(ValueError, match="is not an object"):
+        lupus.result(timeout=5)
+
+
+def test_batches_in_flight_never_exceed_max_concurrency(coalescers):
+    stub = StubBedrock(latency_ms=100)
+    brain = QueryBrain(cache=EntityCache(max_size=1), bedrock=stub)
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def extract_batch(queries):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        try:
+            return brain._invoke_batch(queries)
+        finally:
+            with lock:
+                in_flight -= 1
+
+    coalescer = coalescers(extract_batch, max_batch=1, max_concurrency=2)
+    futures = [coalescer.submit(f"condition {i}") for i in range(6)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert stub.calls == 6
+    assert peak == 2
+    brain.close()
+
+
+def test_closed_coalescer_rejects_new_queries(brain, coalescers):
+    coalescer = coalescers(brain._invoke_batch)
+    coalescer.close()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        coalescer.submit("asthma")
+
+
+def test_batch_flushed_after_pool_shutdown_fails_instead_of_hanging(brain, coalescers):
+    coalescer = coalescers(brain._invoke_batch)
+    coalescer.pool.shutdown(wait=True)
+
+    future = coalescer.submit("lupus")
+    coalescer._flush()
+
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+    assert coalescer.stats()["in_flight"] == 0
+
+
+def test_extract_entities_falls_back_to_rule_entities_when_bedrock_fails():
+    brain = QueryBrain(cache=EntityCache(max_size=1), bedrock=StubBedrock(latency_ms=0, error_rate=1.0))
+
+    entities = brain.extract_entities("trials for children under 12")
+
+    assert entities == {"max_age": 12, "condition": "Children"}
+    brain.close()
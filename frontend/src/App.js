@@ -6,6 +6,8 @@ function App() {
   const [results, setResults] = useState([]);
   const [interpretation, setInterpretation] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const handleSearch = async (e) => {
     e.preventDefault();
@@ -13,16 +15,29 @@ function App() {
     setLoading(true);
     
     try {
-      const response = await axios.get(`http://localhost:5003/search?q=${query}`);
+      const response = await axios.get('http://localhost:5003/search', { params: { q: query } });
       console.log(response.data);
       setResults(response.data.trials);
       setInterpretation(response.data.interpretation);
+      setTotal(response.data.total);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error("Search failed", error);
     }
     setLoading(false);
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      const response = await axios.get('http://localhost:5003/search', { params: { q: query, cursor: nextCursor } });
+      setResults([...results, ...response.data.trials]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error("Load more failed", error);
+    }
+  };
+
   return (
     <div style={styles.container}>
       <header style={styles.header}>
@@ -56,7 +71,7 @@ function App() {
 
       <div style={styles.summaryBar}>
         <h2 style={styles.countText}>
-          {loading ? "Analyzing data..." : `Showing ${results.length} trials`}
+          {loading ? "Analyzing data..." : `Showing ${results.length} of ${total} trials`}
         </h2>
       </div>
 
@@ -91,6 +106,12 @@ function App() {
           </div>
         ))}
       </div>
+
+      {!loading && nextCursor && (
+        <button onClick={loadMore} style={{...styles.button, marginTop: '24px', padding: '12px 35px'}}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }